@@ -6,7 +6,17 @@ from config.config import Settings
 from demotivator.layout import LayoutConfig
 from ratings.service import RatingService
 from services.aquastar_stats import AquaStarStatsService
+from services.asset_registry import AssetRegistry
+from services.avatar_cache import AvatarCache
+from services.caption_buffer import CaptionBuffer
+from services.fallback_pool import FallbackStickerPool
 from services.groq_service import GroqService
+from services.media_scheduler import MediaScheduler
+from services.render_cache import RenderCache
+from services.render_service import RenderService
+from services.sticker_sets import StickerSetCache
+from utils.asyncio_utils import SingleFlightCache
+from utils.temp_files import ScratchSpace
 
 
 @dataclass(frozen=True)
@@ -16,3 +26,14 @@ class AppContext:
     groq: GroqService
     rating: RatingService
     aquastar_stats: AquaStarStatsService
+    render: RenderService
+    media: MediaScheduler
+    render_cache: RenderCache
+    assets: AssetRegistry
+    sticker_sets: StickerSetCache
+    fallback_pool: FallbackStickerPool
+    scratch: ScratchSpace
+    captions: CaptionBuffer
+    trump_texts: SingleFlightCache
+    trump_tweets: SingleFlightCache
+    avatars: AvatarCache
@@ -0,0 +1,132 @@
+"""Media ingestion shared by the media handlers: classify a message once, then download and schedule it."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import os
+from pathlib import Path
+from typing import Any
+
+from aiogram import Bot
+from aiogram.types import Message
+
+from app.context import AppContext
+from services.media_scheduler import PRIORITY_IMAGE, PRIORITY_VIDEO
+from utils.downloads import MEMORY_MAX_BYTES, TELEGRAM_MAX_DOWNLOAD_BYTES, download_bytes, download_file, pick_photo_size
+from utils.server_load import run_media_job
+
+
+# Media kinds. Stickers are told apart by their flags, so no getFile call is needed for that.
+IMAGE = "image"
+VIDEO = "video"
+ANIMATION = "animation"
+VIDEO_NOTE = "video_note"
+VIDEO_STICKER = "video_sticker"
+TGS_STICKER = "tgs_sticker"
+STATIC_STICKER = "static_sticker"
+VOICE = "voice"
+AUDIO = "audio"
+PDF = "pdf"
+TEXT_FILE = "text_file"
+DOCUMENT = "document"
+TEXT = "text"
+LOCATION = "location"
+
+_VIDEO_KINDS = frozenset({VIDEO, ANIMATION, VIDEO_NOTE, VIDEO_STICKER, TGS_STICKER})
+_TEXT_EXTENSIONS = (".txt", ".md", ".json", ".xml", ".html", ".css", ".js", ".py")
+
+
+@dataclass(frozen=True)
+class MediaSource:
+    kind: str
+    # The Telegram object to download (PhotoSize, Video, Sticker, Document, ...); None for text/location.
+    obj: Any = None
+    ext: str = ""
+    file_name: str | None = None
+    mime_type: str = ""
+
+    @property
+    def priority(self) -> int:
+        """Videos and animated stickers go behind still images in the queue."""
+        return PRIORITY_VIDEO if self.kind in _VIDEO_KINDS else PRIORITY_IMAGE
+
+    @property
+    def is_video(self) -> bool:
+        return self.kind in _VIDEO_KINDS
+
+    @property
+    def unique_id(self) -> str | None:
+        return getattr(self.obj, "file_unique_id", None)
+
+    async def read(self, bot: Bot, *, max_bytes: int = MEMORY_MAX_BYTES) -> bytes:
+        return await download_bytes(bot, self.obj, max_bytes=max_bytes)
+
+    async def save(
+        self, bot: Bot, work: Path, *, name: str = "in", max_bytes: int = TELEGRAM_MAX_DOWNLOAD_BYTES
+    ) -> str:
+        """Download into the job directory; returns the path (with the right extension for ffmpeg)."""
+        path = str(work / f"{name}{self.ext}")
+        await download_file(bot, self.obj, path, max_bytes=max_bytes)
+        return path
+
+
+def _classify_document(document) -> MediaSource:
+    mime = document.mime_type or ""
+    name = document.file_name or "file"
+    ext = os.path.splitext(name)[1].lower()
+    if "pdf" in mime or ext == ".pdf":
+        return MediaSource(PDF, document, ".pdf", name, mime)
+    if "image" in mime:
+        return MediaSource(IMAGE, document, ext or ".jpg", name, mime)
+    if "video" in mime or "gif" in mime:
+        return MediaSource(VIDEO, document, ".mp4", name, mime)
+    if "text" in mime or name.endswith(_TEXT_EXTENSIONS):
+        return MediaSource(TEXT_FILE, document, ".txt", name, mime)
+    return MediaSource(DOCUMENT, document, ext, name, mime)
+
+
+def classify(message: Message) -> MediaSource | None:
+    """What a message carries, without any Telegram API calls; None if nothing usable."""
+    if message.photo:
+        return MediaSource(IMAGE, pick_photo_size(message.photo), ".jpg")
+    if message.video_note:
+        return MediaSource(VIDEO_NOTE, message.video_note, ".mp4")
+    if message.animation:
+        return MediaSource(ANIMATION, message.animation, ".mp4")
+    if message.video:
+        return MediaSource(VIDEO, message.video, ".mp4", message.video.file_name, message.video.mime_type or "")
+    if message.sticker:
+        if message.sticker.is_animated:
+            return MediaSource(TGS_STICKER, message.sticker, ".tgs")
+        if message.sticker.is_video:
+            return MediaSource(VIDEO_STICKER, message.sticker, ".webm")
+        return MediaSource(STATIC_STICKER, message.sticker, ".webp")
+    if message.voice:
+        return MediaSource(VOICE, message.voice, ".ogg")
+    if message.audio:
+        name = message.audio.file_name
+        ext = os.path.splitext(name)[1] if name else ""
+        return MediaSource(AUDIO, message.audio, ext or ".mp3", name, message.audio.mime_type or "")
+    if message.document:
+        return _classify_document(message.document)
+    if message.location:
+        return MediaSource(LOCATION, message.location)
+    if message.text:
+        return MediaSource(TEXT)
+    return None
+
+
+async def schedule_media_job(
+    message: Message, ctx: AppContext, job: Callable[[], Awaitable[None]], *, priority: int
+) -> None:
+    """Run `job` in a media scheduler slot, answering with the overload message when the queue is full."""
+    await run_media_job(
+        message,
+        scheduler=ctx.media,
+        job=job,
+        priority=priority,
+        assets=ctx.assets,
+        light_image=ctx.settings.overload_image_light,
+        heavy_image=ctx.settings.overload_image_heavy,
+    )
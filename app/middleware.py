@@ -154,17 +154,17 @@ class ActivityRatingMiddleware(BaseMiddleware):
                         await message.reply(text, parse_mode="HTML")
                         if vr.send_sticker and bot is not None:
                             try:
-                                sset = await bot.get_sticker_set("likvidacia_blcktlk")
-                                if sset.stickers:
-                                    sticker = random.choice(sset.stickers)
+                                stickers = await self._ctx.sticker_sets.get(bot, "likvidacia_blcktlk")
+                                if stickers:
+                                    sticker = random.choice(stickers)
                                     await message.answer_sticker(sticker.file_id)
                             except Exception:
                                 pass
                         if vr.send_xuan_sticker and bot is not None:
                             try:
-                                sset = await bot.get_sticker_set("xuan_sol_by_fStikBot")
-                                if sset.stickers:
-                                    await message.answer_sticker(sset.stickers[0].file_id)
+                                stickers = await self._ctx.sticker_sets.get(bot, "xuan_sol_by_fStikBot")
+                                if stickers:
+                                    await message.answer_sticker(stickers[0].file_id)
                             except Exception:
                                 pass
                         if vr.minigame is not None:
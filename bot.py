@@ -16,9 +16,20 @@ from demotivator.layout import LayoutConfig
 from handlers import all_routers
 from ratings.service import RatingService
 from services.groq_service import GroqService
+from services.media_scheduler import MediaScheduler
+from services.asset_registry import AssetRegistry
+from services.avatar_cache import AvatarCache
+from services.caption_buffer import CaptionBuffer
+from services.fallback_pool import FallbackStickerPool
+from services.render_cache import RenderCache
+from services.render_service import RenderService
+from services.sticker_sets import StickerSetCache, refresh_sticker_sets
 from services.aquastar_stats import AquaStarStatsService, collect_aquastar_stats
+from utils.emoji_cache import configure_emoji_source, prepopulate_from_pack
+from utils.fallback_media import FALLBACK_STICKER_PACKS
 from utils.logging_setup import configure_logging
-from utils.temp_files import cleanup_old_temp_files
+from utils.asyncio_utils import SingleFlightCache
+from utils.temp_files import ScratchSpace, reap_scratch
 
 
 async def main() -> None:
@@ -41,15 +52,79 @@ async def main() -> None:
     aquastar_stats = AquaStarStatsService(db_path=settings.aquastar_stats_db_path)
     aquastar_stats.init_db()
 
+    emoji_cache_dir = settings.cache_dir / "emoji"
+    prepopulate_from_pack(pack_dir=settings.emoji_pack_dir, cache_dir=emoji_cache_dir)
+    configure_emoji_source(
+        cache_dir=emoji_cache_dir,
+        pack_dir=settings.emoji_pack_dir,
+        online=bool(settings.emoji_cache_online),
+    )
+
+    layout_cfg = LayoutConfig(
+        font_paths=settings.font_paths,
+        unicode_font_paths=settings.unicode_font_paths,
+    )
+    render = RenderService(
+        workers=settings.render_workers,
+        layout_cfg=layout_cfg,
+        emoji_cache_dir=emoji_cache_dir,
+        emoji_pack_dir=settings.emoji_pack_dir,
+        emoji_online=bool(settings.emoji_cache_online),
+    )
+    render.start()
+
+    render_cache = RenderCache(
+        root=settings.cache_dir / "renders",
+        max_bytes=settings.render_cache_max_mb * 1024 * 1024,
+    )
+    render_cache.init_db()
+    assets = AssetRegistry(db_path=settings.cache_dir / "assets.sqlite3")
+    assets.init_db()
+
+    sticker_sets = StickerSetCache()
+    fallback_pool = FallbackStickerPool(
+        size=settings.fallback_pool_size,
+        directory=settings.cache_dir / "fallback_pool",
+        sticker_sets=sticker_sets,
+        fallback_avatar=settings.fallback_avatar,
+    )
+    fallback_pool.prepare()
+    scratch = ScratchSpace(base_dir=settings.scratch_dir, max_bytes=settings.scratch_max_mb * 1024 * 1024)
+    scratch.prepare()
+
+    groq = GroqService(api_key=settings.groq_api_key, deadline_seconds=settings.groq_timeout_seconds)
+    captions = CaptionBuffer(
+        groq=groq,
+        db_path=settings.cache_dir / "captions.sqlite3",
+        size=settings.caption_buffer_size,
+    )
+    captions.init_db()
+
     ctx = AppContext(
         settings=settings,
-        layout_cfg=LayoutConfig(
-            font_paths=settings.font_paths,
-            unicode_font_paths=settings.unicode_font_paths,
-        ),
-        groq=GroqService(api_key=settings.groq_api_key),
+        layout_cfg=layout_cfg,
+        groq=groq,
         rating=rating,
         aquastar_stats=aquastar_stats,
+        render=render,
+        media=MediaScheduler(
+            max_concurrent=settings.max_concurrent_processes,
+            max_queue=settings.media_queue_size,
+            max_per_user=settings.media_queue_per_user,
+        ),
+        render_cache=render_cache,
+        assets=assets,
+        sticker_sets=sticker_sets,
+        fallback_pool=fallback_pool,
+        scratch=scratch,
+        captions=captions,
+        trump_texts=SingleFlightCache(ttl_seconds=60 * 60, max_entries=128),
+        trump_tweets=SingleFlightCache(ttl_seconds=60 * 60, max_entries=64),
+        avatars=AvatarCache(
+            render=render,
+            ttl_seconds=settings.avatar_cache_ttl_seconds,
+            max_entries=settings.avatar_cache_size,
+        ),
     )
 
     bot = Bot(token=settings.token)
@@ -65,17 +140,40 @@ async def main() -> None:
 
     await bot.delete_webhook(drop_pending_updates=True)
     logging.info("Bot started")
-    cleanup_old_temp_files()
     aquastar_collector = asyncio.create_task(
         collect_aquastar_stats(aquastar_stats),
         name="aquastar-stats-collector",
     )
+    sticker_set_refresher = asyncio.create_task(
+        refresh_sticker_sets(
+            ctx.sticker_sets,
+            bot,
+            # Random /d stickers plus the sets sent on votes.
+            (*FALLBACK_STICKER_PACKS, "likvidacia_blcktlk", "xuan_sol_by_fStikBot"),
+            interval=30 * 60,
+        ),
+        name="sticker-set-refresher",
+    )
+    fallback_prefetcher = asyncio.create_task(fallback_pool.run(bot), name="fallback-sticker-prefetcher")
+    scratch_reaper = asyncio.create_task(reap_scratch(scratch), name="scratch-reaper")
+    caption_producer = asyncio.create_task(captions.run(), name="caption-buffer-producer")
     try:
         await dp.start_polling(bot)
     finally:
-        aquastar_collector.cancel()
-        with suppress(asyncio.CancelledError):
-            await aquastar_collector
+        background = (
+            aquastar_collector,
+            sticker_set_refresher,
+            fallback_prefetcher,
+            scratch_reaper,
+            caption_producer,
+        )
+        for task in background:
+            task.cancel()
+        for task in background:
+            with suppress(asyncio.CancelledError):
+                await task
+        render.shutdown()
+        await groq.close()
 
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 import os
+import tempfile
 
 
 def _env_int(name: str, default: int) -> int:
@@ -26,6 +27,7 @@ def _env_str(name: str, default: str) -> str:
 class Settings:
     token: str
     groq_api_key: str
+    groq_timeout_seconds: int
 
     base_dir: Path
     log_file: Path
@@ -34,6 +36,9 @@ class Settings:
     overload_image_light: Path
     overload_image_heavy: Path
     max_concurrent_processes: int
+    media_queue_size: int
+    media_queue_per_user: int
+    render_workers: int
 
     rating_db_path: Path
     aquastar_stats_db_path: Path
@@ -51,12 +56,28 @@ class Settings:
     font_paths: tuple[str, ...]
     unicode_font_paths: tuple[str, ...]
 
+    cache_dir: Path
+    emoji_pack_dir: Path
+    emoji_cache_online: int
+    render_cache_max_mb: int
+    fallback_pool_size: int
+    scratch_dir: Path
+    scratch_max_mb: int
+    reverse_memory_mb: int
+    caption_buffer_size: int
+    avatar_cache_size: int
+    avatar_cache_ttl_seconds: int
+
     @classmethod
     def from_env(cls, *, base_dir: Path) -> "Settings":
         token = os.getenv("BOT_TOKEN", "").strip()
         groq_api_key = os.getenv("GROQ_API_KEY", "").strip()
+        groq_timeout_seconds = _env_int("GROQ_TIMEOUT_SECONDS", 8)
 
         max_concurrent_processes = _env_int("MAX_CONCURRENT_PROCESSES", 2)
+        media_queue_size = _env_int("MEDIA_QUEUE_SIZE", 10)
+        media_queue_per_user = _env_int("MEDIA_QUEUE_PER_USER", 2)
+        render_workers = _env_int("RENDER_WORKERS", 2)
         vote_cooldown_seconds = _env_int("VOTE_COOLDOWN_SECONDS", 12 * 60 * 60)
         activity_points_per_award = _env_int("ACTIVITY_POINTS_PER_AWARD", 0)
         activity_cooldown_seconds = _env_int("ACTIVITY_COOLDOWN_SECONDS", 15 * 60)
@@ -67,11 +88,22 @@ class Settings:
         gif_cleanup_target_user_id = _env_int("GIF_CLEANUP_TARGET_USER_ID", 0)
         gif_cleanup_threshold = _env_int("GIF_CLEANUP_THRESHOLD", 5)
         sticker_cleanup_threshold = _env_int("STICKER_CLEANUP_THRESHOLD", 4)
+        emoji_cache_online = _env_int("EMOJI_CACHE_ONLINE", 1)
+        render_cache_max_mb = _env_int("RENDER_CACHE_MAX_MB", 256)
+        fallback_pool_size = _env_int("FALLBACK_POOL_SIZE", 4)
+        scratch_max_mb = _env_int("SCRATCH_MAX_MB", 1024)
+        reverse_memory_mb = _env_int("REVERSE_MEMORY_MB", 384)
+        caption_buffer_size = _env_int("CAPTION_BUFFER_SIZE", 20)
+        avatar_cache_size = _env_int("AVATAR_CACHE_SIZE", 256)
+        avatar_cache_ttl_seconds = _env_int("AVATAR_CACHE_TTL_SECONDS", 60 * 60)
 
         rating_db_path = Path(os.getenv("RATING_DB_PATH", str(base_dir / "ratings.sqlite3")))
         aquastar_stats_db_path = Path(
             os.getenv("AQUASTAR_STATS_DB_PATH", str(base_dir / "aquastar_stats.sqlite3"))
         )
+        cache_dir = Path(os.getenv("CACHE_DIR", str(base_dir / "cache")))
+        emoji_pack_dir = Path(os.getenv("EMOJI_PACK_DIR", str(base_dir / "media" / "emoji")))
+        scratch_dir = Path(os.getenv("SCRATCH_DIR", str(Path(tempfile.gettempdir()) / "dmtvtr-bot")))
 
         font_paths = (
             str(base_dir / "times.ttf"),
@@ -89,12 +121,16 @@ class Settings:
         return cls(
             token=token,
             groq_api_key=groq_api_key,
+            groq_timeout_seconds=groq_timeout_seconds,
             base_dir=base_dir,
             log_file=base_dir / "bot.log",
             fallback_avatar=base_dir / "123.png",
             overload_image_light=base_dir / "2.jpg",
             overload_image_heavy=base_dir / "3.png",
             max_concurrent_processes=max_concurrent_processes,
+            media_queue_size=media_queue_size,
+            media_queue_per_user=media_queue_per_user,
+            render_workers=render_workers,
             rating_db_path=rating_db_path,
             aquastar_stats_db_path=aquastar_stats_db_path,
             vote_cooldown_seconds=vote_cooldown_seconds,
@@ -109,4 +145,15 @@ class Settings:
             sticker_cleanup_threshold=sticker_cleanup_threshold,
             font_paths=font_paths,
             unicode_font_paths=unicode_font_paths,
+            cache_dir=cache_dir,
+            emoji_pack_dir=emoji_pack_dir,
+            emoji_cache_online=emoji_cache_online,
+            render_cache_max_mb=render_cache_max_mb,
+            fallback_pool_size=fallback_pool_size,
+            scratch_dir=scratch_dir,
+            scratch_max_mb=scratch_max_mb,
+            reverse_memory_mb=reverse_memory_mb,
+            caption_buffer_size=caption_buffer_size,
+            avatar_cache_size=avatar_cache_size,
+            avatar_cache_ttl_seconds=avatar_cache_ttl_seconds,
         )
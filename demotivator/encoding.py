@@ -0,0 +1,125 @@
+"""Encoding profiles for demotivator videos sent back to Telegram as animations."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import math
+
+
+@dataclass(frozen=True)
+class EncodePreset:
+    name: str
+    x264_preset: str
+    crf: int
+    # Rough bits per pixel per frame this preset produces on sticker/meme content;
+    # only used to estimate output size before encoding.
+    bits_per_pixel: float
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """Size/latency targets plus a fast and a compact preset.
+
+    The fast preset is used while its estimated output fits `target_bytes`;
+    otherwise the compact one, and if even that does not fit, the frame is
+    downscaled (never below `min_side`). `max_bytes` is enforced via VBV.
+    """
+
+    name: str
+    fast: EncodePreset
+    compact: EncodePreset
+    target_bytes: int
+    max_bytes: int
+    max_fps: int
+    min_side: int
+
+
+@dataclass(frozen=True)
+class EncodePlan:
+    preset: EncodePreset
+    scale: float
+    fps: int
+    estimated_bytes: int
+    maxrate_kbps: int
+
+
+ANIMATION = EncodingProfile(
+    name="animation",
+    fast=EncodePreset(name="fast", x264_preset="ultrafast", crf=23, bits_per_pixel=0.10),
+    compact=EncodePreset(name="compact", x264_preset="veryfast", crf=27, bits_per_pixel=0.045),
+    target_bytes=4 * 1024 * 1024,
+    max_bytes=8 * 1024 * 1024,
+    max_fps=30,
+    min_side=240,
+)
+
+COMPACT = EncodingProfile(
+    name="compact",
+    fast=EncodePreset(name="fast", x264_preset="superfast", crf=27, bits_per_pixel=0.06),
+    compact=EncodePreset(name="compact", x264_preset="faster", crf=30, bits_per_pixel=0.03),
+    target_bytes=1536 * 1024,
+    max_bytes=3 * 1024 * 1024,
+    max_fps=25,
+    min_side=200,
+)
+
+PROFILES: dict[str, EncodingProfile] = {p.name: p for p in (ANIMATION, COMPACT)}
+
+
+def estimate_bytes(*, preset: EncodePreset, width: int, height: int, fps: float, duration: float) -> int:
+    return int(width * height * fps * duration * preset.bits_per_pixel / 8)
+
+
+def plan_encode(
+    profile: EncodingProfile,
+    *,
+    width: int,
+    height: int,
+    fps: float,
+    duration: float,
+    preset: EncodePreset | None = None,
+) -> EncodePlan:
+    """Pick preset and downscale factor for a canvas of width x height."""
+    out_fps = min(profile.max_fps, int(round(fps))) if fps > 0 else profile.max_fps
+    duration = max(duration, 0.5)
+
+    def estimate(p: EncodePreset, scale: float = 1.0) -> int:
+        return estimate_bytes(
+            preset=p, width=int(width * scale), height=int(height * scale), fps=out_fps, duration=duration
+        )
+
+    chosen = preset or profile.fast
+    if preset is None and estimate(chosen) > profile.target_bytes:
+        chosen = profile.compact
+
+    scale = 1.0
+    est = estimate(chosen)
+    if est > profile.target_bytes:
+        scale = math.sqrt(profile.target_bytes / est)
+        scale = max(scale, profile.min_side / max(1, min(width, height)))
+        scale = min(scale, 1.0)
+        est = estimate(chosen, scale)
+
+    maxrate_kbps = max(100, int(profile.max_bytes * 8 / duration / 1000 * 0.9))
+    return EncodePlan(preset=chosen, scale=scale, fps=out_fps, estimated_bytes=est, maxrate_kbps=maxrate_kbps)
+
+
+def x264_args(plan: EncodePlan) -> list[str]:
+    """Output args for a Telegram-animation-friendly MP4 (H.264, no audio, faststart)."""
+    return [
+        "-c:v",
+        "libx264",
+        "-preset",
+        plan.preset.x264_preset,
+        "-crf",
+        str(plan.preset.crf),
+        "-maxrate",
+        f"{plan.maxrate_kbps}k",
+        "-bufsize",
+        f"{plan.maxrate_kbps * 2}k",
+        "-pix_fmt",
+        "yuv420p",
+        "-an",
+        "-movflags",
+        "+faststart",
+    ]
@@ -1,12 +1,61 @@
+"""Demotivator media generation (image/video)."""
+
 from __future__ import annotations
 
+from io import BytesIO
 import logging
-import os
 
 from PIL import Image
 
 from demotivator.layout import LayoutConfig, build_layout_params
-from utils.image_effects import apply_invert, apply_vintage
+from utils.image_effects import apply_effect
+
+
+AVATAR_SIDE = 600
+
+
+def prepare_demotivator_avatar(image: bytes) -> bytes | None:
+    """Resize a profile photo to the square render_demotivator uses for avatars (JPEG output)."""
+    try:
+        img = Image.open(BytesIO(image)).convert("RGB")
+        img = img.resize((AVATAR_SIDE, AVATAR_SIDE), Image.Resampling.LANCZOS)
+        out = BytesIO()
+        img.save(out, "JPEG", quality=95)
+        return out.getvalue()
+    except Exception as e:
+        logging.error("Avatar resize error: %s", e, exc_info=True)
+        return None
+
+
+def render_demotivator(
+    orig: Image.Image,
+    *,
+    text: str,
+    layout_cfg: LayoutConfig,
+    is_avatar: bool = False,
+    effect: str | None = None,
+) -> Image.Image:
+    """Compose the demotivator canvas around an already opened image."""
+    orig = orig.convert("RGBA")
+
+    if is_avatar or max(orig.size) < 300:
+        orig = orig.resize((AVATAR_SIDE, AVATAR_SIDE), Image.Resampling.LANCZOS)
+
+    if effect in {"invert", "vintage"}:
+        orig = apply_effect(orig, effect).convert("RGBA")
+
+    bg, t_w, t_h, p_x, p_y = build_layout_params(
+        base_w=orig.width,
+        base_h=orig.height,
+        text=text,
+        for_video=False,
+        cfg=layout_cfg,
+    )
+
+    orig = orig.resize((t_w, t_h), Image.Resampling.LANCZOS)
+    bg_rgba = bg.convert("RGBA")
+    bg_rgba.paste(orig, (p_x, p_y), orig)
+    return bg_rgba.convert("RGB")
 
 
 def create_demotivator_image(
@@ -20,43 +69,40 @@ def create_demotivator_image(
 ) -> bool:
     """Create a demotivator from an image."""
     try:
-        orig = Image.open(img_path).convert("RGBA")
-
-        if is_avatar or max(orig.size) < 300:
-            orig = orig.resize((600, 600), Image.Resampling.LANCZOS)
-
-        # Apply effect (by saving to temp file to reuse path-based effects).
-        if effect in {"invert", "vintage"}:
-            temp_path = img_path + "_temp.png"
-            try:
-                orig.save(temp_path)
-                if effect == "invert":
-                    if apply_invert(img_path=temp_path, output_path=temp_path):
-                        orig = Image.open(temp_path).convert("RGBA")
-                else:
-                    if apply_vintage(img_path=temp_path, output_path=temp_path):
-                        orig = Image.open(temp_path).convert("RGBA")
-            finally:
-                try:
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                except Exception:
-                    pass
-
-        bg, t_w, t_h, p_x, p_y = build_layout_params(
-            base_w=orig.width,
-            base_h=orig.height,
+        result = render_demotivator(
+            Image.open(img_path),
             text=text,
-            for_video=False,
-            cfg=layout_cfg,
+            layout_cfg=layout_cfg,
+            is_avatar=is_avatar,
+            effect=effect,
         )
-
-        orig = orig.resize((t_w, t_h), Image.Resampling.LANCZOS)
-        bg_rgba = bg.convert("RGBA")
-        bg_rgba.paste(orig, (p_x, p_y), orig)
-        bg_rgba.convert("RGB").save(output_path, quality=95)
+        result.save(output_path, quality=95)
         return True
     except Exception as e:
         logging.error("Image demotivator error: %s", e, exc_info=True)
         return False
 
+
+def create_demotivator_image_bytes(
+    image: bytes,
+    *,
+    text: str,
+    layout_cfg: LayoutConfig,
+    is_avatar: bool = False,
+    effect: str | None = None,
+) -> bytes | None:
+    """Bytes-in/bytes-out variant of create_demotivator_image (JPEG output)."""
+    try:
+        result = render_demotivator(
+            Image.open(BytesIO(image)),
+            text=text,
+            layout_cfg=layout_cfg,
+            is_avatar=is_avatar,
+            effect=effect,
+        )
+        out = BytesIO()
+        result.save(out, "JPEG", quality=95)
+        return out.getvalue()
+    except Exception as e:
+        logging.error("Image demotivator error: %s", e, exc_info=True)
+        return None
@@ -5,6 +5,7 @@ from dataclasses import dataclass
 from PIL import Image, ImageDraw
 from pilmoji import Pilmoji
 
+from utils.emoji_cache import emoji_source
 from utils.fonts import get_font, get_unicode_font
 from utils.text import fit_text, has_emoji
 
@@ -75,7 +76,7 @@ def build_layout_params(
     )
 
     y_text = pad_top + target_h + gap_to_text
-    with Pilmoji(canvas) as pilmoji:
+    with Pilmoji(canvas, source=emoji_source()) as pilmoji:
         for line in lines:
             line_w, _ = pilmoji.getsize(line, font=font)
             x_text = (total_w - line_w) / 2
@@ -1,92 +1,126 @@
 from __future__ import annotations
 
+from io import BytesIO
 import logging
 import os
-import subprocess
 
-from PIL import Image
+from PIL import ImageDraw
 
+from demotivator.encoding import ANIMATION, EncodePreset, EncodingProfile, plan_encode, x264_args
 from demotivator.layout import LayoutConfig, build_layout_params
+from utils.asyncio_utils import run_in_thread
+from utils.ffmpeg import MediaInfo, probe_media, run_ffmpeg
 
 
-def extract_first_frame(*, video_path: str, output_jpg: str) -> bool:
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        video_path,
-        "-vframes",
-        "1",
-        "-q:v",
-        "2",
-        output_jpg,
-    ]
-    subprocess.run(cmd, capture_output=True, check=False)
-    return os.path.exists(output_jpg) and os.path.getsize(output_jpg) > 0
+def _render_overlay(
+    *, width: int, height: int, text: str, layout_cfg: LayoutConfig
+) -> tuple[bytes, int, int, int, int, int, int]:
+    """Render the demotivator frame as an RGBA PNG with a transparent window for the video.
 
+    Returns (png, canvas_w, canvas_h, target_w, target_h, pad_x, pad_y).
+    """
+    bg, t_w, t_h, p_x, p_y = build_layout_params(
+        base_w=width,
+        base_h=height,
+        text=text,
+        for_video=True,
+        cfg=layout_cfg,
+    )
+    overlay = bg.convert("RGBA")
+    ImageDraw.Draw(overlay).rectangle([(p_x, p_y), (p_x + t_w - 1, p_y + t_h - 1)], fill=(0, 0, 0, 0))
 
-def create_demotivator_video(
+    buf = BytesIO()
+    overlay.save(buf, "PNG", compress_level=1)
+    return buf.getvalue(), overlay.width, overlay.height, t_w, t_h, p_x, p_y
+
+
+async def create_demotivator_video(
     *,
     vid_path: str,
     text: str,
     output_path: str,
     layout_cfg: LayoutConfig,
     max_duration_seconds: int = 30,
+    timeout_seconds: float = 180,
+    profile: EncodingProfile = ANIMATION,
+    preset: EncodePreset | None = None,
+    info: MediaInfo | None = None,
 ) -> bool:
-    """Create a demotivator video with a static background and overlayed input video."""
-    frame_path = vid_path + ".jpg"
-    bg_path = vid_path + "_bg.png"
-
+    """Create a demotivator video in a single ffmpeg encode.
+
+    The input is probed for its size, the static frame is rendered in memory and
+    piped to ffmpeg's stdin, and the padded video is overlaid with it. The frame
+    is the secondary overlay input, so its only frame repeats until the video ends.
+    Preset and output size come from `profile` (see demotivator.encoding).
+    Pass `info` when the input was already probed.
+    """
     try:
         logging.info("Video demotivator: input=%s output=%s", vid_path, output_path)
 
-        if not extract_first_frame(video_path=vid_path, output_jpg=frame_path):
-            logging.error("Failed to extract first frame")
+        if info is None:
+            info = await probe_media(vid_path)
+        if info is None:
+            logging.error("Failed to probe video dimensions")
             return False
+        logging.info("Video dimensions: %sx%s", info.width, info.height)
 
-        frame = Image.open(frame_path)
-        w, h = frame.size
-        logging.info("Video dimensions: %sx%s", w, h)
-
-        bg, t_w, t_h, p_x, p_y = build_layout_params(
-            base_w=w,
-            base_h=h,
+        png, c_w, c_h, t_w, t_h, p_x, p_y = await run_in_thread(
+            _render_overlay,
+            width=info.width,
+            height=info.height,
             text=text,
-            for_video=True,
-            cfg=layout_cfg,
+            layout_cfg=layout_cfg,
+        )
+
+        duration = min(info.duration, max_duration_seconds) if info.duration > 0 else max_duration_seconds
+        plan = plan_encode(profile, width=c_w, height=c_h, fps=info.fps, duration=duration, preset=preset)
+        logging.info(
+            "Encode plan: profile=%s preset=%s scale=%.2f fps=%s estimate=%s bytes",
+            profile.name,
+            plan.preset.name,
+            plan.scale,
+            plan.fps,
+            plan.estimated_bytes,
+        )
+        if plan.scale < 1.0:
+            # Re-render the frame at the smaller size so the caption stays crisp. The scale is
+            # relative to the already capped video window, not the raw input size.
+            png, c_w, c_h, t_w, t_h, p_x, p_y = await run_in_thread(
+                _render_overlay,
+                width=max(2, int(t_w * plan.scale)),
+                height=max(2, int(t_h * plan.scale)),
+                text=text,
+                layout_cfg=layout_cfg,
+            )
+
+        fps_filter = f",fps={plan.fps}" if info.fps <= 0 or info.fps > plan.fps else ""
+        filter_complex = (
+            f"[0:v]scale={t_w}:{t_h},pad={c_w}:{c_h}:{p_x}:{p_y}:color=black[vid];"
+            f"[vid][1:v]overlay=0:0{fps_filter}[out]"
         )
-        bg.save(bg_path)
-
-        filter_complex = f"[1:v]scale={t_w}:{t_h}[vid];[0:v][vid]overlay={p_x}:{p_y}:shortest=1"
-
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-loop",
-            "1",
-            "-i",
-            bg_path,
-            "-i",
-            vid_path,
-            "-filter_complex",
-            filter_complex,
-            "-c:v",
-            "libx264",
-            "-preset",
-            "ultrafast",
-            "-crf",
-            "20",
-            "-pix_fmt",
-            "yuv420p",
-            "-t",
-            str(max_duration_seconds),
-            output_path,
-        ]
-
-        logging.info("Starting ffmpeg: %s", " ".join(cmd))
-        result = subprocess.run(cmd, capture_output=True, check=False)
-        if result.returncode != 0:
-            logging.error("FFmpeg failed (%s): %s", result.returncode, result.stderr.decode(errors="ignore"))
+
+        result = await run_ffmpeg(
+            [
+                "-i",
+                vid_path,
+                "-f",
+                "png_pipe",
+                "-i",
+                "pipe:0",
+                "-filter_complex",
+                filter_complex,
+                "-map",
+                "[out]",
+                *x264_args(plan),
+                "-t",
+                str(max_duration_seconds),
+                output_path,
+            ],
+            timeout=timeout_seconds,
+            input=png,
+            label="ffmpeg demotivator",
+        )
+        if not result.ok:
             return False
 
         if not os.path.exists(output_path):
@@ -100,11 +134,3 @@ def create_demotivator_video(
     except Exception as e:
         logging.error("Video demotivator error: %s", e, exc_info=True)
         return False
-    finally:
-        for f in (frame_path, bg_path):
-            try:
-                if os.path.exists(f):
-                    os.remove(f)
-            except Exception:
-                pass
-
@@ -1,23 +1,39 @@
 from __future__ import annotations
 
-import glob
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 import logging
-import os
+from pathlib import Path
 
 from aiogram import Bot, F, Router
 from aiogram.filters import Command
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters.command import CommandObject
-from aiogram.types import FSInputFile, Message
+from aiogram.types import BufferedInputFile, FSInputFile, Message
 
 from app.context import AppContext
-from demotivator.image_creator import create_demotivator_image
+from app.media_ingest import (
+    ANIMATION,
+    IMAGE,
+    STATIC_STICKER,
+    TEXT,
+    TGS_STICKER,
+    VIDEO,
+    VIDEO_NOTE,
+    VIDEO_STICKER,
+    MediaSource,
+    classify,
+    schedule_media_job,
+)
+from services.avatar_cache import DEMOTIVATOR as DEMOTIVATOR_AVATAR
+from services.media_scheduler import PRIORITY_IMAGE
+from services.render_cache import RenderCache
 from demotivator.layout import LayoutConfig
 from demotivator.video_creator import create_demotivator_video
-from utils.asyncio_utils import run_in_thread
+from utils.downloads import DownloadTooLargeError, download_bytes
 from utils.fallback_media import get_random_fallback_image
 from utils.media_converter import convert_tgs_to_mp4_simple
-from utils.server_load import check_server_load, send_overload_message
-from utils.text import generate_text_image
+from utils.temp_files import ScratchQuotaError
 
 
 router = Router(name="demotivator")
@@ -27,21 +43,73 @@ def _layout_cfg(ctx: AppContext) -> LayoutConfig:
     return ctx.layout_cfg
 
 
-async def _reject_if_overloaded(message: Message, ctx: AppContext) -> bool:
-    can_process, count = check_server_load(max_concurrent_processes=ctx.settings.max_concurrent_processes)
-    if can_process:
+def _cache_key(source: MediaSource | None, *, caption: str, effect: str | None) -> str | None:
+    unique_id = source.unique_id if source is not None else None
+    if unique_id is None:
+        return None
+    return RenderCache.key(file_unique_id=unique_id, caption=caption, effect=effect)
+
+
+async def _answer_from_cache(message: Message, ctx: AppContext, cache_key: str | None) -> bool:
+    """Resend a previously rendered result; False if there is none (or it is no longer valid)."""
+    if cache_key is None:
         return False
-    logging.warning("Server overloaded (%s processes), rejecting request", count)
-    await send_overload_message(
-        message,
-        process_count=count,
-        max_concurrent_processes=ctx.settings.max_concurrent_processes,
-        light_image=ctx.settings.overload_image_light,
-        heavy_image=ctx.settings.overload_image_heavy,
-    )
+    hit = await ctx.render_cache.get(cache_key)
+    if hit is None:
+        return False
+    try:
+        if hit.kind == "animation":
+            await message.answer_animation(hit.file_id)
+        elif hit.file_id:
+            await message.answer_photo(hit.file_id)
+        else:
+            sent = await message.answer_photo(BufferedInputFile(hit.data, filename="demotivator.jpg"))
+            await ctx.render_cache.put(cache_key, kind="photo", file_id=sent.photo[-1].file_id, data=hit.data)
+    except TelegramBadRequest as e:
+        logging.warning("Cached render could not be resent, rendering again: %s", e)
+        await ctx.render_cache.forget(cache_key)
+        return False
+    logging.info("Demotivator served from render cache")
     return True
 
 
+async def _answer_demotivator(
+    message: Message,
+    ctx: AppContext,
+    image: bytes,
+    *,
+    text: str,
+    is_avatar: bool = False,
+    effect: str | None = None,
+    cache_key: str | None = None,
+) -> bool:
+    """Render a demotivator in the render pool and send it as a photo."""
+    result = await ctx.render.demotivator_image(image, text=text, is_avatar=is_avatar, effect=effect)
+    if result is None:
+        return False
+    sent = await message.answer_photo(BufferedInputFile(result, filename="demotivator.jpg"))
+    if cache_key is not None and sent.photo:
+        await ctx.render_cache.put(cache_key, kind="photo", file_id=sent.photo[-1].file_id, data=result)
+    return True
+
+
+async def _answer_animation(
+    message: Message, ctx: AppContext, output_file: str, *, cache_key: str | None = None
+) -> None:
+    sent = await message.answer_animation(FSInputFile(output_file))
+    media = sent.animation or sent.video or sent.document
+    if cache_key is not None and media is not None:
+        await ctx.render_cache.put(cache_key, kind="animation", file_id=media.file_id)
+
+
+async def _award(message: Message, ctx: AppContext) -> None:
+    if message.from_user:
+        try:
+            await ctx.rating.add_points(user=message.from_user, delta=1)
+        except Exception:
+            pass
+
+
 def _effect_for_command(cmd: str) -> str | None:
     cmd = cmd.lower()
     if cmd == "inv":
@@ -62,40 +130,56 @@ async def handle_media_with_caption(message: Message, bot: Bot, ctx: AppContext)
     if not any(caption.lower().startswith(p) for p in cmd_prefixes):
         return
 
-    if await _reject_if_overloaded(message, ctx):
-        return
-
     # Parse: "/cmd args..."
     parts = caption.split(maxsplit=1)
     cmd = parts[0].lstrip("/").split("@", 1)[0]
     effect = _effect_for_command(cmd)
     final_caption = parts[1] if len(parts) > 1 else "..."
+    source = classify(message)
+    if source is None:
+        return
+    cache_key = _cache_key(source, caption=final_caption, effect=effect)
+
+    if await _answer_from_cache(message, ctx, cache_key):
+        await _award(message, ctx)
+        return
 
+    await schedule_media_job(
+        message,
+        ctx,
+        lambda: _handle_media_with_caption(
+            message, bot, ctx, source=source, effect=effect, final_caption=final_caption, cache_key=cache_key
+        ),
+        priority=PRIORITY_IMAGE,
+    )
+
+
+async def _handle_media_with_caption(
+    message: Message,
+    bot: Bot,
+    ctx: AppContext,
+    *,
+    source: MediaSource,
+    effect: str | None,
+    final_caption: str,
+    cache_key: str | None,
+) -> None:
     status_msg = await message.reply("⏳ Делаем демотиватор...")
-    input_file = f"temp_in_{message.message_id}.jpg"
-    output_file = f"temp_out_{message.message_id}.jpg"
 
     processed_ok = False
     try:
-        if message.photo:
-            await bot.download(message.photo[-1], destination=input_file)
-        else:
-            await bot.download(message.document, destination=input_file)
-
-        success = await run_in_thread(
-            create_demotivator_image,
-            img_path=input_file,
-            text=final_caption,
-            output_path=output_file,
-            layout_cfg=_layout_cfg(ctx),
-            effect=effect,
-        )
-        if success:
-            await message.answer_photo(FSInputFile(output_file))
+        image = await source.read(bot)
+
+        if await _answer_demotivator(
+            message, ctx, image, text=final_caption, effect=effect, cache_key=cache_key
+        ):
             processed_ok = True
         else:
             await message.answer("Ошибка обработки")
 
+    except DownloadTooLargeError as e:
+        logging.info("Refused to download media: %s", e)
+        await message.answer(f"⚠️ Файл слишком большой (максимум {e.limit_mb} МБ)")
     except Exception as e:
         logging.error("Media caption handler error: %s", e, exc_info=True)
         await message.answer("Произошла ошибка")
@@ -105,18 +189,8 @@ async def handle_media_with_caption(message: Message, bot: Bot, ctx: AppContext)
         except Exception:
             pass
 
-        for f in (input_file, output_file):
-            try:
-                if os.path.exists(f):
-                    os.remove(f)
-            except Exception:
-                pass
-
-        if processed_ok and message.from_user:
-            try:
-                await ctx.rating.add_points(user=message.from_user, delta=1)
-            except Exception:
-                pass
+        if processed_ok:
+            await _award(message, ctx)
 
 
 @router.message(Command("d", "dd", "д", "дд", "inv", "vin"))
@@ -124,9 +198,201 @@ async def handle_command(message: Message, bot: Bot, command: CommandObject, ctx
     if not message.from_user:
         return
 
-    if await _reject_if_overloaded(message, ctx):
-        return
+    source: MediaSource | None = None
+    cache_key: str | None = None
+    if message.reply_to_message:
+        source = classify(message.reply_to_message)
+        cache_key = _cache_key(
+            source,
+            caption=(command.args or "").strip() or "...",
+            effect=_effect_for_command(command.command),
+        )
+        if await _answer_from_cache(message, ctx, cache_key):
+            await _award(message, ctx)
+            return
+
+    # Solo /d: the random sticker is not known yet, queue it as an image job.
+    await schedule_media_job(
+        message,
+        ctx,
+        lambda: _handle_command(message, bot, command, ctx, source=source, cache_key=cache_key),
+        priority=source.priority if source is not None else PRIORITY_IMAGE,
+    )
+
+
+async def _handle_command(
+    message: Message,
+    bot: Bot,
+    command: CommandObject,
+    ctx: AppContext,
+    *,
+    source: MediaSource | None,
+    cache_key: str | None = None,
+) -> None:
+    try:
+        async with ctx.scratch.job("demotivator") as work:
+            await _handle_command_in(message, bot, command, ctx, work=work, source=source, cache_key=cache_key)
+    except ScratchQuotaError as e:
+        logging.warning("No scratch space for demotivator: %s", e)
+        await message.answer("⚠️ Сервер перегружен, попробуй чуть позже")
+
+
+@dataclass(frozen=True)
+class _ReplyJob:
+    """A /d reply being processed; what every strategy below gets."""
+
+    message: Message
+    bot: Bot
+    ctx: AppContext
+    work: Path
+    source: MediaSource | None
+    args: str
+    caption: str
+    effect: str | None
+    cache_key: str | None
+    status: Message
+
+
+# (status text, error text) per video kind.
+_VIDEO_TEXTS = {
+    VIDEO_NOTE: ("⏳ Обрабатываем кружок...", "Ошибка обработки кружка"),
+    VIDEO: ("⏳ Рендерим видео...", "Ошибка видео"),
+    ANIMATION: ("⏳ Рендерим видео...", "Ошибка видео"),
+    VIDEO_STICKER: ("⏳ Рендерим видео...", "Ошибка обработки видео стикера"),
+}
+
+
+async def _render_video(job: _ReplyJob, vid_path: str) -> bool:
+    output_file = str(job.work / "out.mp4")
+    if not await create_demotivator_video(
+        vid_path=vid_path,
+        text=job.caption,
+        output_path=output_file,
+        layout_cfg=_layout_cfg(job.ctx),
+    ):
+        return False
+    await _answer_animation(job.message, job.ctx, output_file, cache_key=job.cache_key)
+    return True
+
+
+async def _reply_video(job: _ReplyJob) -> bool:
+    # Video notes have always been rendered without the effect instead of being refused.
+    if job.effect and job.source.kind != VIDEO_NOTE:
+        await job.message.answer("Эффекты работают только с изображениями")
+        return False
+    status_text, error_text = _VIDEO_TEXTS[job.source.kind]
+    input_file = await job.source.save(job.bot, job.work)
+    await job.status.edit_text(status_text)
+    if await _render_video(job, input_file):
+        return True
+    await job.message.answer(error_text)
+    return False
+
+
+async def _reply_image(job: _ReplyJob) -> bool:
+    image = await job.source.read(job.bot)
+    is_sticker = job.source.kind == STATIC_STICKER
+    if await _answer_demotivator(
+        job.message,
+        job.ctx,
+        image,
+        text=job.caption,
+        is_avatar=is_sticker,
+        effect=job.effect,
+        cache_key=job.cache_key,
+    ):
+        return True
+    if not is_sticker:
+        await job.message.answer("Ошибка фото")
+    return False
+
+
+async def _reply_tgs(job: _ReplyJob) -> bool:
+    input_file = await job.source.save(job.bot, job.work)
+    video_file = str(job.work / "anim.mp4")
+    await job.status.edit_text("⏳ Рендерим анимацию...")
+
+    if await convert_tgs_to_mp4_simple(tgs_path=input_file, output_mp4=video_file, run_chunk=job.ctx.render.run):
+        if await _render_video(job, video_file):
+            return True
+        await job.message.answer("Ошибка обработки")
+        return False
+
+    thumbnail = job.source.obj.thumbnail
+    if thumbnail is None:
+        return False
+    thumb = await download_bytes(job.bot, thumbnail)
+    return await _answer_demotivator(
+        job.message, job.ctx, thumb, text=job.caption, is_avatar=True, effect=job.effect
+    )
+
+
+async def _reply_text(job: _ReplyJob) -> bool:
+    replied = job.message.reply_to_message
+    text_content = replied.text.strip()
+    avatar: bytes | None = None
+    if replied.from_user:
+        avatar = await job.ctx.avatars.get(job.bot, replied.from_user.id, DEMOTIVATOR_AVATAR)
+
+    if not avatar:
+        pooled = job.ctx.fallback_pool.take(image_only=True)
+        if pooled is not None:
+            avatar = pooled.data
+
+    if not avatar:
+        avatar_file = await get_random_fallback_image(
+            job.bot,
+            directory=job.work,
+            fallback_avatar=job.ctx.settings.fallback_avatar,
+            sticker_sets=job.ctx.sticker_sets,
+        )
+        if avatar_file:
+            avatar = Path(avatar_file).read_bytes()
+
+    if avatar:
+        text_for_demot = job.args if job.args else text_content
+        return await _answer_demotivator(
+            job.message, job.ctx, avatar, text=text_for_demot, is_avatar=True, effect=job.effect
+        )
+
+    # Generate image from text.
+    text_img = await job.ctx.render.text_image(text_content)
+    return bool(text_img) and await _answer_demotivator(
+        job.message, job.ctx, text_img, text=job.caption, effect=job.effect
+    )
+
 
+async def _reply_fallback(job: _ReplyJob) -> bool:
+    """Anything else: render the command text as the picture."""
+    fallback_text = job.args if job.args else "Unknown"
+    text_img = await job.ctx.render.text_image(fallback_text)
+    return bool(text_img) and await _answer_demotivator(
+        job.message, job.ctx, text_img, text=fallback_text, effect=job.effect
+    )
+
+
+_REPLY_STRATEGIES: dict[str, Callable[[_ReplyJob], Awaitable[bool]]] = {
+    VIDEO_NOTE: _reply_video,
+    VIDEO: _reply_video,
+    ANIMATION: _reply_video,
+    VIDEO_STICKER: _reply_video,
+    IMAGE: _reply_image,
+    STATIC_STICKER: _reply_image,
+    TGS_STICKER: _reply_tgs,
+    TEXT: _reply_text,
+}
+
+
+async def _handle_command_in(
+    message: Message,
+    bot: Bot,
+    command: CommandObject,
+    ctx: AppContext,
+    *,
+    work: Path,
+    source: MediaSource | None,
+    cache_key: str | None,
+) -> None:
     effect = _effect_for_command(command.command)
     args = (command.args or "").strip()
 
@@ -135,28 +401,42 @@ async def handle_command(message: Message, bot: Bot, command: CommandObject, ctx
         if args:
             caption = args
         else:
-            caption = await run_in_thread(ctx.groq.generate_demotivator_text)
+            # Pre-generated in the background; ask the LLM inline only if the buffer ran dry.
+            caption = await ctx.captions.take() or await ctx.groq.generate_demotivator_text()
             logging.info("Using AI-generated caption: %s", caption)
 
         status_msg = await message.reply("⏳ Выбираю стикер...")
         processed_ok = False
 
+        pooled = ctx.fallback_pool.take()
         try:
-            fallback_file = await get_random_fallback_image(
-                bot, message_id=message.message_id, fallback_avatar=ctx.settings.fallback_avatar
-            )
-            if not fallback_file:
-                await message.answer("Не удалось получить стикер")
-                return
-
-            if fallback_file.endswith(".webm"):
-                output_file = f"temp_out_{message.message_id}.mp4"
-                success = await run_in_thread(
-                    create_demotivator_video,
-                    vid_path=fallback_file,
+            if pooled is not None:
+                # Already downloaded (and probed) in the background.
+                video_file, image, video_info = pooled.video_path, pooled.data, pooled.info
+            else:
+                fallback_file = await get_random_fallback_image(
+                    bot,
+                    directory=work,
+                    fallback_avatar=ctx.settings.fallback_avatar,
+                    sticker_sets=ctx.sticker_sets,
+                )
+                if not fallback_file:
+                    await message.answer("Не удалось получить стикер")
+                    return
+                video_info = None
+                if fallback_file.endswith(".webm"):
+                    video_file, image = fallback_file, None
+                else:
+                    video_file, image = None, Path(fallback_file).read_bytes()
+
+            if video_file:
+                output_file = str(work / "out.mp4")
+                success = await create_demotivator_video(
+                    vid_path=video_file,
                     text=caption,
                     output_path=output_file,
                     layout_cfg=_layout_cfg(ctx),
+                    info=video_info,
                 )
                 if success:
                     await message.answer_animation(FSInputFile(output_file))
@@ -164,18 +444,7 @@ async def handle_command(message: Message, bot: Bot, command: CommandObject, ctx
                 else:
                     await message.answer("Ошибка обработки")
             else:
-                output_file = f"temp_out_{message.message_id}.jpg"
-                success = await run_in_thread(
-                    create_demotivator_image,
-                    img_path=fallback_file,
-                    text=caption,
-                    output_path=output_file,
-                    layout_cfg=_layout_cfg(ctx),
-                    is_avatar=True,
-                    effect=effect,
-                )
-                if success:
-                    await message.answer_photo(FSInputFile(output_file))
+                if await _answer_demotivator(message, ctx, image, text=caption, is_avatar=True, effect=effect):
                     processed_ok = True
                 else:
                     await message.answer("Ошибка обработки")
@@ -189,269 +458,36 @@ async def handle_command(message: Message, bot: Bot, command: CommandObject, ctx
             except Exception:
                 pass
 
-            # Cleanup temp artifacts
-            for pattern in (
-                f"temp_fallback_{message.message_id}*",
-                f"temp_in_{message.message_id}*",
-                f"temp_out_{message.message_id}*",
-                f"temp_text_{message.message_id}*",
-                f"temp_trump_*_{message.message_id}*",
-            ):
-                for file_path in glob.glob(pattern):
-                    try:
-                        os.remove(file_path)
-                    except Exception:
-                        pass
+            if pooled is not None and pooled.video_path:
+                Path(pooled.video_path).unlink(missing_ok=True)
 
             if processed_ok:
-                try:
-                    await ctx.rating.add_points(user=message.from_user, delta=1)
-                except Exception:
-                    pass
+                await _award(message, ctx)
 
         return
 
     # === REPLY MODE ===
-    replied = message.reply_to_message
-    final_caption = args if args else "..."
-
     status_msg = await message.reply("⏳ Делаем...")
-    input_file_base = f"temp_in_{message.message_id}"
-    output_file_jpg = f"temp_out_{message.message_id}.jpg"
-    text_img_file = f"temp_text_{message.message_id}.jpg"
+    job = _ReplyJob(
+        message=message,
+        bot=bot,
+        ctx=ctx,
+        work=work,
+        source=source,
+        args=args,
+        caption=args if args else "...",
+        effect=effect,
+        cache_key=cache_key,
+        status=status_msg,
+    )
+    strategy = _REPLY_STRATEGIES.get(source.kind if source is not None else "", _reply_fallback)
 
     processed_ok = False
     try:
-        # Video notes
-        if replied.video_note:
-            input_file = input_file_base + ".mp4"
-            output_file = f"temp_out_{message.message_id}.mp4"
-            await bot.download(replied.video_note, destination=input_file)
-            await status_msg.edit_text("⏳ Обрабатываем кружок...")
-            success = await run_in_thread(
-                create_demotivator_video,
-                vid_path=input_file,
-                text=final_caption,
-                output_path=output_file,
-                layout_cfg=_layout_cfg(ctx),
-            )
-            if success:
-                await message.answer_animation(FSInputFile(output_file))
-                processed_ok = True
-            else:
-                await message.answer("Ошибка обработки кружка")
-
-        # Videos / GIFs
-        elif replied.video or replied.animation:
-            if effect:
-                await message.answer("Эффекты работают только с изображениями")
-                return
-
-            input_file = input_file_base + ".mp4"
-            output_file = f"temp_out_{message.message_id}.mp4"
-            obj = replied.video if replied.video else replied.animation
-            await bot.download(obj, destination=input_file)
-            await status_msg.edit_text("⏳ Рендерим видео...")
-            success = await run_in_thread(
-                create_demotivator_video,
-                vid_path=input_file,
-                text=final_caption,
-                output_path=output_file,
-                layout_cfg=_layout_cfg(ctx),
-            )
-            if success:
-                await message.answer_animation(FSInputFile(output_file))
-                processed_ok = True
-            else:
-                await message.answer("Ошибка видео")
-
-        # Images
-        elif replied.photo or (
-            replied.document and replied.document.mime_type and "image" in replied.document.mime_type
-        ):
-            obj = replied.photo[-1] if replied.photo else replied.document
-            input_file = input_file_base + ".jpg"
-            await bot.download(obj, destination=input_file)
-            success = await run_in_thread(
-                create_demotivator_image,
-                img_path=input_file,
-                text=final_caption,
-                output_path=output_file_jpg,
-                layout_cfg=_layout_cfg(ctx),
-                effect=effect,
-            )
-            if success:
-                await message.answer_photo(FSInputFile(output_file_jpg))
-                processed_ok = True
-            else:
-                await message.answer("Ошибка фото")
-
-        # Stickers
-        elif replied.sticker:
-            file_info = await bot.get_file(replied.sticker.file_id)
-            file_path = file_info.file_path or ""
-
-            # TGS stickers
-            if file_path.endswith(".tgs"):
-                input_file = input_file_base + ".tgs"
-                await bot.download(replied.sticker, destination=input_file)
-                video_file = input_file.replace(".tgs", "_anim.mp4")
-                await status_msg.edit_text("⏳ Рендерим анимацию...")
-
-                conv_ok = await run_in_thread(
-                    convert_tgs_to_mp4_simple, tgs_path=input_file, output_mp4=video_file
-                )
-                if conv_ok:
-                    output_file = f"temp_out_{message.message_id}.mp4"
-                    vid_ok = await run_in_thread(
-                        create_demotivator_video,
-                        vid_path=video_file,
-                        text=final_caption,
-                        output_path=output_file,
-                        layout_cfg=_layout_cfg(ctx),
-                    )
-                    if vid_ok:
-                        await message.answer_animation(FSInputFile(output_file))
-                        processed_ok = True
-                    else:
-                        await message.answer("Ошибка обработки")
-                else:
-                    if replied.sticker.thumbnail:
-                        thumb_file = input_file_base + ".jpg"
-                        await bot.download(replied.sticker.thumbnail, destination=thumb_file)
-                        img_ok = await run_in_thread(
-                            create_demotivator_image,
-                            img_path=thumb_file,
-                            text=final_caption,
-                            output_path=output_file_jpg,
-                            layout_cfg=_layout_cfg(ctx),
-                            is_avatar=True,
-                            effect=effect,
-                        )
-                        if img_ok:
-                            await message.answer_photo(FSInputFile(output_file_jpg))
-                            processed_ok = True
-
-                for f in (video_file,):
-                    try:
-                        if os.path.exists(f):
-                            os.remove(f)
-                    except Exception:
-                        pass
-
-            # Video stickers (.webm)
-            elif file_path.endswith(".webm"):
-                if effect:
-                    await message.answer("Эффекты работают только с изображениями")
-                    return
-                input_file = input_file_base + ".webm"
-                output_file = f"temp_out_{message.message_id}.mp4"
-                await bot.download(replied.sticker, destination=input_file)
-                success = await run_in_thread(
-                    create_demotivator_video,
-                    vid_path=input_file,
-                    text=final_caption,
-                    output_path=output_file,
-                    layout_cfg=_layout_cfg(ctx),
-                )
-                if success:
-                    await message.answer_animation(FSInputFile(output_file))
-                    processed_ok = True
-                else:
-                    await message.answer("Ошибка обработки видео стикера")
-
-            # Static stickers
-            else:
-                input_file = input_file_base + ".webp"
-                await bot.download(replied.sticker, destination=input_file)
-                success = await run_in_thread(
-                    create_demotivator_image,
-                    img_path=input_file,
-                    text=final_caption,
-                    output_path=output_file_jpg,
-                    layout_cfg=_layout_cfg(ctx),
-                    is_avatar=True,
-                    effect=effect,
-                )
-                if success:
-                    await message.answer_photo(FSInputFile(output_file_jpg))
-                    processed_ok = True
-
-        # Text replies
-        elif replied.text:
-            text_content = replied.text.strip()
-            avatar_file = None
-            try:
-                if replied.from_user:
-                    photos = await bot.get_user_profile_photos(replied.from_user.id, limit=1)
-                    if photos.total_count > 0:
-                        avatar_file = input_file_base + ".jpg"
-                        await bot.download(photos.photos[0][-1], destination=avatar_file)
-            except Exception:
-                avatar_file = None
-
-            if not avatar_file:
-                avatar_file = await get_random_fallback_image(
-                    bot, message_id=message.message_id, fallback_avatar=ctx.settings.fallback_avatar
-                )
-
-            if avatar_file:
-                text_for_demot = args if args else text_content
-                success = await run_in_thread(
-                    create_demotivator_image,
-                    img_path=avatar_file,
-                    text=text_for_demot,
-                    output_path=output_file_jpg,
-                    layout_cfg=_layout_cfg(ctx),
-                    is_avatar=True,
-                    effect=effect,
-                )
-                if success:
-                    await message.answer_photo(FSInputFile(output_file_jpg))
-                    processed_ok = True
-            else:
-                # Generate image from text.
-                if await run_in_thread(
-                    generate_text_image,
-                    text=text_content,
-                    output_path=text_img_file,
-                    font_paths=ctx.settings.font_paths,
-                    unicode_font_paths=ctx.settings.unicode_font_paths,
-                ):
-                    ok = await run_in_thread(
-                        create_demotivator_image,
-                        img_path=text_img_file,
-                        text=final_caption,
-                        output_path=output_file_jpg,
-                        layout_cfg=_layout_cfg(ctx),
-                        effect=effect,
-                    )
-                    if ok:
-                        await message.answer_photo(FSInputFile(output_file_jpg))
-                        processed_ok = True
-
-        # Fallback: generate from text
-        else:
-            fallback_text = args if args else "Unknown"
-            if await run_in_thread(
-                generate_text_image,
-                text=fallback_text,
-                output_path=text_img_file,
-                font_paths=ctx.settings.font_paths,
-                unicode_font_paths=ctx.settings.unicode_font_paths,
-            ):
-                ok = await run_in_thread(
-                    create_demotivator_image,
-                    img_path=text_img_file,
-                    text=fallback_text,
-                    output_path=output_file_jpg,
-                    layout_cfg=_layout_cfg(ctx),
-                    effect=effect,
-                )
-                if ok:
-                    await message.answer_photo(FSInputFile(output_file_jpg))
-                    processed_ok = True
-
+        processed_ok = await strategy(job)
+    except DownloadTooLargeError as e:
+        logging.info("Refused to download media: %s", e)
+        await message.answer(f"⚠️ Файл слишком большой (максимум {e.limit_mb} МБ)")
     except Exception as e:
         logging.error("Demotivator command error: %s", e, exc_info=True)
         await message.answer("Ошибка обработки")
@@ -461,21 +497,5 @@ async def handle_command(message: Message, bot: Bot, command: CommandObject, ctx
         except Exception:
             pass
 
-        for f in os.listdir("."):
-            if (
-                f.startswith(f"temp_in_{message.message_id}")
-                or f.startswith(f"temp_out_{message.message_id}")
-                or f.startswith(f"temp_text_{message.message_id}")
-                or f.startswith(f"temp_fallback_{message.message_id}")
-            ):
-                try:
-                    os.remove(f)
-                except Exception:
-                    pass
-
         if processed_ok:
-            try:
-                await ctx.rating.add_points(user=message.from_user, delta=1)
-            except Exception:
-                pass
-
+            await _award(message, ctx)
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
 import logging
-import os
-import shutil
-import subprocess
-import tempfile
 import time
 
 from aiogram import Bot, F, Router
 from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import (
     BufferedInputFile,
@@ -21,13 +21,14 @@ from aiogram.types import (
 from PIL import Image
 
 from app.context import AppContext
-from utils.asyncio_utils import run_in_thread
+from utils.downloads import DownloadTooLargeError, download_file, pick_photo_size
+from utils.ffmpeg import probe_media
 from utils.emoji_pack import (
     calculate_grid_size,
     create_custom_emoji_pack,
-    split_image_to_grid,
     split_video_to_grid,
 )
+from utils.temp_files import ScratchQuotaError
 
 
 router = Router(name="emoji")
@@ -37,6 +38,22 @@ emoji_pack_pending: dict[str, dict] = {}
 emoji_pack_naming: dict[str, dict] = {}
 
 
+@lru_cache(maxsize=1)
+def _spacer_webp() -> bytes:
+    buf = BytesIO()
+    Image.new("RGBA", (1, 100), (255, 255, 255, 1)).save(buf, "WEBP", quality=95)
+    return buf.getvalue()
+
+
+async def _split_media(
+    *, ctx: AppContext, input_file: str, is_video: bool, cols: int, rows: int, temp_dir: str
+) -> list[bytes]:
+    """Split the input into encoded emoji tiles (row-major)."""
+    if is_video:
+        return await split_video_to_grid(video_path=input_file, cols=cols, rows=rows, output_dir=temp_dir)
+    return await ctx.render.split_image(Path(input_file).read_bytes(), cols=cols, rows=rows)
+
+
 async def _create_emoji_pack_with_name(
     *,
     message: Message,
@@ -62,14 +79,9 @@ async def _create_emoji_pack_with_name(
 
     try:
         # === SPLIT ===
-        if is_video:
-            output_parts = await run_in_thread(
-                split_video_to_grid, video_path=input_file, cols=cols, rows=rows, output_dir=temp_dir
-            )
-        else:
-            output_parts = await run_in_thread(
-                split_image_to_grid, image_path=input_file, cols=cols, rows=rows, output_dir=temp_dir
-            )
+        output_parts = await _split_media(
+            ctx=ctx, input_file=input_file, is_video=is_video, cols=cols, rows=rows, temp_dir=temp_dir
+        )
 
         if not output_parts:
             await status_msg.edit_text("❌ Ошибка при нарезке медиа")
@@ -99,11 +111,17 @@ async def _create_emoji_pack_with_name(
         telegram_row_width = 8
         padding_count = max(0, telegram_row_width - cols)
 
-        spacer_webp = f"{temp_dir}/spacer.webp"
-        spacer_img = Image.new("RGBA", (1, 100), (255, 255, 255, 1))
-        spacer_img.save(spacer_webp, "WEBP", quality=95)
-        with open(spacer_webp, "rb") as f:
-            spacer_data = f.read()
+        spacer_data = _spacer_webp()
+        spacer_id: str | None = None
+        if padding_count:
+            spacer_id = await ctx.assets.sticker_file(bot, user_id=user_id, name="spacer.webp", data=spacer_data)
+
+        def spacer_sticker(row_idx: int, pad_idx: int, *, file_id: str | None) -> InputSticker:
+            return InputSticker(
+                sticker=file_id or BufferedInputFile(spacer_data, filename=f"spacer_{row_idx}_{pad_idx}.webp"),
+                emoji_list=["⬜"],
+                format="static",
+            )
 
         stickers: list[InputSticker] = []
         emoji_map = [
@@ -135,10 +153,7 @@ async def _create_emoji_pack_with_name(
                 if i >= len(output_parts):
                     break
 
-                part_path = output_parts[i]
-                with open(part_path, "rb") as f:
-                    file_data = f.read()
-
+                file_data = output_parts[i]
                 filename = f"part_{i}.webm" if is_video else f"part_{i}.webp"
                 stickers.append(
                     InputSticker(
@@ -149,25 +164,39 @@ async def _create_emoji_pack_with_name(
                 )
 
             for pad_idx in range(padding_count):
-                stickers.append(
-                    InputSticker(
-                        sticker=BufferedInputFile(spacer_data, filename=f"spacer_{row_idx}_{pad_idx}.webp"),
-                        emoji_list=["⬜"],
-                        format="static",
-                    )
-                )
+                stickers.append(spacer_sticker(row_idx, pad_idx, file_id=spacer_id))
 
         if not stickers:
             await status_msg.edit_text("❌ Не удалось подготовить стикеры")
             return
 
-        result = await bot.create_new_sticker_set(
-            user_id=user_id,
-            name=pack_name,
-            title=pack_title,
-            stickers=stickers,
-            sticker_type="custom_emoji",
-        )
+        try:
+            result = await bot.create_new_sticker_set(
+                user_id=user_id,
+                name=pack_name,
+                title=pack_title,
+                stickers=stickers,
+                sticker_type="custom_emoji",
+            )
+        except TelegramBadRequest as e:
+            if spacer_id is None or padding_count == 0:
+                raise
+            # The stored spacer file_id may have been rejected: retry once with the raw file.
+            logging.warning("Sticker set creation failed with cached spacer, retrying: %s", e)
+            await ctx.assets.invalidate_sticker_file(user_id=user_id, name="spacer.webp", data=spacer_data)
+            spacers = iter(
+                spacer_sticker(row_idx, pad_idx, file_id=None)
+                for row_idx in range(rows)
+                for pad_idx in range(padding_count)
+            )
+            stickers = [next(spacers) if st.sticker == spacer_id else st for st in stickers]
+            result = await bot.create_new_sticker_set(
+                user_id=user_id,
+                name=pack_name,
+                title=pack_title,
+                stickers=stickers,
+                sticker_type="custom_emoji",
+            )
         if not result:
             await status_msg.edit_text("❌ Не удалось создать стикер-пак")
             return
@@ -197,11 +226,7 @@ async def _create_emoji_pack_with_name(
         else:
             await message.answer(f"❌ Ошибка создания пака: {error_msg[:100]}")
     finally:
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        except Exception:
-            pass
+        await ctx.scratch.release(Path(temp_dir))
 
 
 async def _process_emoji_pack(
@@ -227,13 +252,9 @@ async def _process_emoji_pack(
     try:
         if is_video:
             await status_msg.edit_text("⏳ Обрабатываю видео (может занять время)...")
-            output_parts = await run_in_thread(
-                split_video_to_grid, video_path=input_file, cols=cols, rows=rows, output_dir=temp_dir
-            )
-        else:
-            output_parts = await run_in_thread(
-                split_image_to_grid, image_path=input_file, cols=cols, rows=rows, output_dir=temp_dir
-            )
+        output_parts = await _split_media(
+            ctx=ctx, input_file=input_file, is_video=is_video, cols=cols, rows=rows, temp_dir=temp_dir
+        )
 
         if not output_parts:
             await status_msg.edit_text("❌ Ошибка при нарезке медиа")
@@ -427,7 +448,12 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
     replied = source
     status_msg = await message.reply("⏳ Создаю эмодзи-пак...")
 
-    temp_dir = tempfile.mkdtemp(prefix="emoji_pack_")
+    try:
+        temp_dir = str(await ctx.scratch.create("emoji"))
+    except ScratchQuotaError as e:
+        logging.warning("No scratch space for emoji pack: %s", e)
+        await status_msg.edit_text("⚠️ Сервер перегружен, попробуй чуть позже")
+        return
     input_file: str | None = None
 
     try:
@@ -437,7 +463,7 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
         if replied.photo:
             is_image = True
             input_file = f"{temp_dir}/input.jpg"
-            await bot.download(replied.photo[-1], destination=input_file)
+            await download_file(bot, pick_photo_size(replied.photo), input_file)
 
         elif replied.document:
             mime = replied.document.mime_type or ""
@@ -449,11 +475,11 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
                 elif "webp" in mime:
                     ext = ".webp"
                 input_file = f"{temp_dir}/input{ext}"
-                await bot.download(replied.document, destination=input_file)
+                await download_file(bot, replied.document, input_file)
             elif "video" in mime or "gif" in mime:
                 is_video = True
                 input_file = f"{temp_dir}/input.mp4"
-                await bot.download(replied.document, destination=input_file)
+                await download_file(bot, replied.document, input_file)
             else:
                 await status_msg.edit_text("❌ Неподдерживаемый тип файла")
                 return
@@ -462,7 +488,7 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
             is_video = True
             input_file = f"{temp_dir}/input.mp4"
             obj = replied.video if replied.video else replied.animation
-            await bot.download(obj, destination=input_file)
+            await download_file(bot, obj, input_file)
 
         elif replied.sticker:
             file_info = await bot.get_file(replied.sticker.file_id)
@@ -470,11 +496,11 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
             if file_path.endswith(".webm"):
                 is_video = True
                 input_file = f"{temp_dir}/input.webm"
-                await bot.download(replied.sticker, destination=input_file)
+                await download_file(bot, file_info, input_file)
             elif file_path.endswith(".webp") or file_path.endswith(".png"):
                 is_image = True
                 input_file = f"{temp_dir}/input.webp"
-                await bot.download(replied.sticker, destination=input_file)
+                await download_file(bot, file_info, input_file)
             elif file_path.endswith(".tgs"):
                 await status_msg.edit_text(
                     "❌ TGS стикеры пока не поддерживаются.\nИспользуйте статичные стикеры или видео."
@@ -498,46 +524,12 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
             width, height = img.size
             duration = 0.0
         else:
-            # Probe video dims
-            cmd = [
-                "ffprobe",
-                "-v",
-                "error",
-                "-select_streams",
-                "v:0",
-                "-show_entries",
-                "stream=width,height",
-                "-of",
-                "csv=p=0",
-                input_file,
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-            if result.returncode != 0:
-                await status_msg.edit_text("❌ Ошибка обработки видео")
-                return
-            try:
-                width, height = map(int, result.stdout.strip().split(","))
-            except Exception:
+            info = await probe_media(input_file)
+            if info is None:
                 await status_msg.edit_text("❌ Не удалось определить размеры видео")
                 return
-
-            cmd_duration = [
-                "ffprobe",
-                "-v",
-                "error",
-                "-select_streams",
-                "v:0",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                input_file,
-            ]
-            result_duration = subprocess.run(cmd_duration, capture_output=True, text=True, check=False)
-            try:
-                duration = float(result_duration.stdout.strip())
-            except Exception:
-                duration = 0.0
+            width, height = info.width, info.height
+            duration = info.duration
 
         is_private_chat = message.chat.type == "private"
         if is_private_chat and not user_grid:
@@ -605,6 +597,9 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
             temp_dir=temp_dir,
         )
 
+    except DownloadTooLargeError as e:
+        logging.info("Refused to download media: %s", e)
+        await message.answer(f"❌ Файл слишком большой (максимум {e.limit_mb} МБ)")
     except Exception as e:
         logging.error("Emoji pack creation error: %s", e, exc_info=True)
         await message.answer(f"❌ Произошла ошибка: {str(e)[:100]}")
@@ -613,11 +608,7 @@ async def cmd_emoji(message: Message, bot: Bot, ctx: AppContext) -> None:
         key = f"{message.from_user.id}_{message.message_id}" if message.from_user else ""
         if key and key in emoji_pack_pending:
             return
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        except Exception:
-            pass
+        await ctx.scratch.release(Path(temp_dir))
 
 
 @router.message((F.photo | F.video | F.animation | F.document) & F.caption.startswith("/emoji"))
@@ -286,17 +286,17 @@ async def cmd_plus(message: Message, bot: Bot, ctx: AppContext) -> None:
     await message.answer(text, parse_mode="HTML")
     if vr.send_sticker:
         try:
-            sset = await bot.get_sticker_set("likvidacia_blcktlk")
-            if sset.stickers:
-                sticker = random.choice(sset.stickers)
+            stickers = await ctx.sticker_sets.get(bot, "likvidacia_blcktlk")
+            if stickers:
+                sticker = random.choice(stickers)
                 await message.answer_sticker(sticker.file_id)
         except Exception:
             pass
     if vr.send_xuan_sticker:
         try:
-            sset = await bot.get_sticker_set("xuan_sol_by_fStikBot")
-            if sset.stickers:
-                await message.answer_sticker(sset.stickers[0].file_id)
+            stickers = await ctx.sticker_sets.get(bot, "xuan_sol_by_fStikBot")
+            if stickers:
+                await message.answer_sticker(stickers[0].file_id)
         except Exception:
             pass
 
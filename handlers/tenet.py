@@ -1,21 +1,46 @@
 from __future__ import annotations
 
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 import os
 import logging
+from pathlib import Path
 
 from aiogram import Bot, Router
 from aiogram.filters import Command
-from aiogram.types import FSInputFile, Message
+from aiogram.types import BufferedInputFile, FSInputFile, Message
 
 from app.context import AppContext
+from app.media_ingest import (
+    ANIMATION,
+    AUDIO,
+    DOCUMENT,
+    IMAGE,
+    LOCATION,
+    PDF,
+    STATIC_STICKER,
+    TEXT,
+    TEXT_FILE,
+    TGS_STICKER,
+    VIDEO,
+    VIDEO_NOTE,
+    VIDEO_STICKER,
+    VOICE,
+    MediaSource,
+    classify,
+    schedule_media_job,
+)
 from utils.asyncio_utils import run_in_thread
-from utils.server_load import check_server_load, send_overload_message
+from utils.downloads import DownloadTooLargeError
+from utils.temp_files import ScratchQuotaError
 from utils.tenet import (
+    PDF_REVERSE_MAX_PAGES,
+    TEXT_REVERSE_MAX_BYTES,
     calculate_antipode,
-    mirror_image,
     reverse_audio,
     reverse_pdf,
     reverse_text,
+    reverse_text_file,
     reverse_video,
 )
 
@@ -23,6 +48,10 @@ from utils.tenet import (
 router = Router(name="tenet")
 
 
+def _reverse_budget(ctx: AppContext) -> int:
+    return ctx.settings.reverse_memory_mb * 1024 * 1024
+
+
 @router.message(Command("tenet"))
 async def cmd_tenet(message: Message, bot: Bot, ctx: AppContext) -> None:
     if not message.reply_to_message:
@@ -40,240 +69,176 @@ async def cmd_tenet(message: Message, bot: Bot, ctx: AppContext) -> None:
         )
         return
 
-    replied = message.reply_to_message
-    status_msg = await message.reply("⏳ Обрабатываем в стиле Тенет...")
+    source = classify(message.reply_to_message)
+    if source is None or source.kind in _INSTANT_KINDS:
+        # Nothing to render: answer right away without a media slot or scratch directory,
+        # so a full scratch quota never blocks text and locations.
+        await _cmd_tenet_in(message, bot, ctx, work=None, source=source)
+        return
 
-    input_file = f"temp_tenet_in_{message.message_id}"
-    output_file = f"temp_tenet_out_{message.message_id}"
-    processed_ok = False
+    await schedule_media_job(
+        message,
+        ctx,
+        lambda: _cmd_tenet(message, bot, ctx, source=source),
+        priority=source.priority,
+    )
 
-    try:
-        # === LOCATION ===
-        if replied.location:
-            anti = calculate_antipode(lat=replied.location.latitude, lon=replied.location.longitude)
-            await status_msg.edit_text(
-                f"🌍 Исходная точка: {replied.location.latitude:.6f}, {replied.location.longitude:.6f}\n"
-                f"🔄 Пробиваем Землю насквозь...\n"
-                f"🌏 Антипод: {anti.lat:.6f}, {anti.lon:.6f}"
-            )
-            await message.answer_location(latitude=anti.lat, longitude=anti.lon)
-            processed_ok = True
-            return
-
-        # === TEXT ===
-        if replied.text:
-            await status_msg.edit_text(f"🔄 {reverse_text(replied.text)}")
-            processed_ok = True
-            return
-
-        # === PHOTO ===
-        if replied.photo:
-            input_file += ".jpg"
-            output_file += ".jpg"
-            await bot.download(replied.photo[-1], destination=input_file)
-            await status_msg.edit_text("⏳ Зеркалим изображение...")
-            success = await run_in_thread(mirror_image, img_path=input_file, output_path=output_file)
-            if success:
-                await message.answer_photo(FSInputFile(output_file))
-                processed_ok = True
-            else:
-                await message.answer("Ошибка при зеркалировании")
-            return
-
-        # === VOICE ===
-        if replied.voice:
-            input_file += ".ogg"
-            output_file += ".ogg"
-            await bot.download(replied.voice, destination=input_file)
-            await status_msg.edit_text("⏳ Переворачиваем голосовое...")
-            success = await run_in_thread(reverse_audio, audio_path=input_file, output_path=output_file)
-            if success:
-                await message.answer_voice(FSInputFile(output_file))
-                processed_ok = True
-            else:
-                await message.answer("Ошибка при реверсе голосового")
-            return
-
-        # === AUDIO ===
-        if replied.audio:
-            ext = ".mp3"
-            if replied.audio.file_name:
-                ext = os.path.splitext(replied.audio.file_name)[1] or ".mp3"
-            input_file += ext
-            output_file += ".ogg"
-            await bot.download(replied.audio, destination=input_file)
-            await status_msg.edit_text("⏳ Переворачиваем аудио...")
-            success = await run_in_thread(reverse_audio, audio_path=input_file, output_path=output_file)
-            if success:
-                await message.answer_audio(FSInputFile(output_file), title="Reversed Audio")
-                processed_ok = True
-            else:
-                await message.answer("Ошибка при реверсе аудио")
-            return
-
-        # === DOCUMENT ===
-        if replied.document:
-            mime = replied.document.mime_type or ""
-            fname = replied.document.file_name or "file"
-
-            if "pdf" in mime or fname.lower().endswith(".pdf"):
-                input_file += ".pdf"
-                output_file += ".pdf"
-                await bot.download(replied.document, destination=input_file)
-                await status_msg.edit_text("⏳ Переворачиваем страницы PDF...")
-                success = await run_in_thread(reverse_pdf, pdf_path=input_file, output_path=output_file)
-                if success:
-                    await message.answer_document(FSInputFile(output_file, filename="reversed.pdf"))
-                    processed_ok = True
-                else:
-                    await message.answer("Ошибка при реверсе PDF (нужен PyPDF2)")
-                return
-
-            if "image" in mime:
-                input_file += ".jpg"
-                output_file += ".jpg"
-                await bot.download(replied.document, destination=input_file)
-                await status_msg.edit_text("⏳ Зеркалим изображение...")
-                success = await run_in_thread(mirror_image, img_path=input_file, output_path=output_file)
-                if success:
-                    await message.answer_photo(FSInputFile(output_file))
-                    processed_ok = True
-                else:
-                    await message.answer("Ошибка при зеркалировании")
-                return
-
-            if "text" in mime or fname.endswith((".txt", ".md", ".json", ".xml", ".html", ".css", ".js", ".py")):
-                input_file += ".txt"
-                await bot.download(replied.document, destination=input_file)
-                with open(input_file, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-                reversed_content = reverse_text(content)
-                if len(reversed_content) > 4000:
-                    output_file += ".txt"
-                    with open(output_file, "w", encoding="utf-8") as f:
-                        f.write(reversed_content)
-                    await message.answer_document(
-                        FSInputFile(output_file, filename=f"reversed_{fname}")
-                    )
-                else:
-                    await message.answer(f"```\n{reversed_content[:4000]}\n```", parse_mode="Markdown")
-                processed_ok = True
-                return
-
-            if "video" in mime:
-                can_process, count = check_server_load(
-                    max_concurrent_processes=ctx.settings.max_concurrent_processes
-                )
-                if not can_process:
-                    await send_overload_message(
-                        message,
-                        process_count=count,
-                        max_concurrent_processes=ctx.settings.max_concurrent_processes,
-                        light_image=ctx.settings.overload_image_light,
-                        heavy_image=ctx.settings.overload_image_heavy,
-                    )
-                    return
-
-                input_file += ".mp4"
-                output_file += ".mp4"
-                await bot.download(replied.document, destination=input_file)
-                await status_msg.edit_text("⏳ Переворачиваем видео...")
-                success = await run_in_thread(reverse_video, vid_path=input_file, output_path=output_file)
-                if success:
-                    await message.answer_video(FSInputFile(output_file))
-                    processed_ok = True
-                else:
-                    await message.answer("Ошибка при реверсе видео")
-                return
-
-            await message.answer(f"Не знаю как перевернуть этот тип файла: {mime}")
-            return
-
-        # === VIDEO / ANIMATION / VIDEO NOTE ===
-        if replied.video or replied.animation or replied.video_note:
-            can_process, count = check_server_load(
-                max_concurrent_processes=ctx.settings.max_concurrent_processes
-            )
-            if not can_process:
-                await send_overload_message(
-                    message,
-                    process_count=count,
-                    max_concurrent_processes=ctx.settings.max_concurrent_processes,
-                    light_image=ctx.settings.overload_image_light,
-                    heavy_image=ctx.settings.overload_image_heavy,
-                )
-                return
-
-            obj = replied.video or replied.animation or replied.video_note
-            input_file += ".mp4"
-            output_file += ".mp4"
-            await bot.download(obj, destination=input_file)
-            await status_msg.edit_text("⏳ Переворачиваем время...")
-            success = await run_in_thread(reverse_video, vid_path=input_file, output_path=output_file)
-            if success:
-                # For GIF/animation use answer_animation, for video answer_video.
-                if replied.animation or replied.video_note:
-                    await message.answer_animation(FSInputFile(output_file))
-                else:
-                    await message.answer_video(FSInputFile(output_file))
-                processed_ok = True
-            else:
-                await message.answer("Ошибка при реверсе видео")
-            return
-
-        # === STICKER ===
-        if replied.sticker:
-            file_info = await bot.get_file(replied.sticker.file_id)
-            file_path = file_info.file_path or ""
-
-            if file_path.endswith(".webm"):
-                can_process, count = check_server_load(
-                    max_concurrent_processes=ctx.settings.max_concurrent_processes
-                )
-                if not can_process:
-                    await send_overload_message(
-                        message,
-                        process_count=count,
-                        max_concurrent_processes=ctx.settings.max_concurrent_processes,
-                        light_image=ctx.settings.overload_image_light,
-                        heavy_image=ctx.settings.overload_image_heavy,
-                    )
-                    return
-
-                input_file += ".webm"
-                output_file += ".mp4"
-                await bot.download(replied.sticker, destination=input_file)
-                await status_msg.edit_text("⏳ Переворачиваем видео-стикер...")
-                success = await run_in_thread(reverse_video, vid_path=input_file, output_path=output_file)
-                if success:
-                    await message.answer_animation(FSInputFile(output_file))
-                    processed_ok = True
-                else:
-                    await message.answer("Ошибка при реверсе стикера")
-                return
-
-            if file_path.endswith(".webp") or file_path.endswith(".png"):
-                input_file += ".webp"
-                output_file += ".jpg"
-                await bot.download(replied.sticker, destination=input_file)
-                await status_msg.edit_text("⏳ Зеркалим стикер...")
-                success = await run_in_thread(mirror_image, img_path=input_file, output_path=output_file)
-                if success:
-                    await message.answer_photo(FSInputFile(output_file))
-                    processed_ok = True
-                else:
-                    await message.answer("Ошибка при зеркалировании стикера")
-                return
-
-            if file_path.endswith(".tgs"):
-                await message.answer("TGS стикеры пока не поддерживаются для /tenet")
-                return
-
-            await message.answer("Неизвестный тип стикера")
-            return
 
+async def _cmd_tenet(message: Message, bot: Bot, ctx: AppContext, *, source: MediaSource | None) -> None:
+    try:
+        async with ctx.scratch.job("tenet") as work:
+            await _cmd_tenet_in(message, bot, ctx, work=work, source=source)
+    except ScratchQuotaError as e:
+        logging.warning("No scratch space for tenet: %s", e)
+        await message.answer("⚠️ Сервер перегружен, попробуй чуть позже")
+
+
+@dataclass(frozen=True)
+class _TenetJob:
+    message: Message
+    bot: Bot
+    ctx: AppContext
+    # None for _INSTANT_KINDS, which write no files.
+    work: Path | None
+    source: MediaSource
+    status: Message
+
+
+async def _tenet_location(job: _TenetJob) -> bool:
+    location = job.source.obj
+    anti = calculate_antipode(lat=location.latitude, lon=location.longitude)
+    await job.status.edit_text(
+        f"🌍 Исходная точка: {location.latitude:.6f}, {location.longitude:.6f}\n"
+        f"🔄 Пробиваем Землю насквозь...\n"
+        f"🌏 Антипод: {anti.lat:.6f}, {anti.lon:.6f}"
+    )
+    await job.message.answer_location(latitude=anti.lat, longitude=anti.lon)
+    return True
+
+
+async def _tenet_text(job: _TenetJob) -> bool:
+    await job.status.edit_text(f"🔄 {reverse_text(job.message.reply_to_message.text)}")
+    return True
+
+
+async def _tenet_image(job: _TenetJob) -> bool:
+    is_sticker = job.source.kind == STATIC_STICKER
+    image = await job.source.read(job.bot)
+    await job.status.edit_text("⏳ Зеркалим стикер..." if is_sticker else "⏳ Зеркалим изображение...")
+    mirrored = await job.ctx.render.mirror_image(image)
+    if mirrored:
+        await job.message.answer_photo(BufferedInputFile(mirrored, filename="mirrored.jpg"))
+        return True
+    await job.message.answer("Ошибка при зеркалировании стикера" if is_sticker else "Ошибка при зеркалировании")
+    return False
+
+
+async def _tenet_audio(job: _TenetJob) -> bool:
+    is_voice = job.source.kind == VOICE
+    input_file = await job.source.save(job.bot, job.work)
+    output_file = str(job.work / "out.ogg")
+    await job.status.edit_text("⏳ Переворачиваем голосовое..." if is_voice else "⏳ Переворачиваем аудио...")
+    if not await reverse_audio(audio_path=input_file, output_path=output_file):
+        await job.message.answer("Ошибка при реверсе голосового" if is_voice else "Ошибка при реверсе аудио")
+        return False
+    if is_voice:
+        await job.message.answer_voice(FSInputFile(output_file))
+    else:
+        await job.message.answer_audio(FSInputFile(output_file), title="Reversed Audio")
+    return True
+
+
+async def _tenet_pdf(job: _TenetJob) -> bool:
+    input_file = await job.source.save(job.bot, job.work)
+    output_file = str(job.work / "out.pdf")
+    await job.status.edit_text("⏳ Переворачиваем страницы PDF...")
+    if not await job.ctx.render.run(reverse_pdf, pdf_path=input_file, output_path=output_file):
+        await job.message.answer(f"Ошибка при реверсе PDF (не больше {PDF_REVERSE_MAX_PAGES} страниц)")
+        return False
+    await job.message.answer_document(FSInputFile(output_file, filename="reversed.pdf"))
+    return True
+
+
+async def _tenet_text_file(job: _TenetJob) -> bool:
+    input_file = await job.source.save(job.bot, job.work, max_bytes=TEXT_REVERSE_MAX_BYTES)
+    output_file = str(job.work / "out.txt")
+    if not await run_in_thread(reverse_text_file, input_path=input_file, output_path=output_file):
+        await job.message.answer("Ошибка при реверсе текста")
+        return False
+    # Short results go inline; a UTF-8 character is at most 4 bytes.
+    reversed_content = None
+    if os.path.getsize(output_file) <= 4000 * 4:
+        reversed_content = Path(output_file).read_text(encoding="utf-8")
+    if reversed_content is None or len(reversed_content) > 4000:
+        await job.message.answer_document(FSInputFile(output_file, filename=f"reversed_{job.source.file_name}"))
+    else:
+        await job.message.answer(f"```\n{reversed_content}\n```", parse_mode="Markdown")
+    return True
+
+
+async def _tenet_video(job: _TenetJob) -> bool:
+    is_sticker = job.source.kind == VIDEO_STICKER
+    input_file = await job.source.save(job.bot, job.work)
+    output_file = str(job.work / "out.mp4")
+    await job.status.edit_text("⏳ Переворачиваем видео-стикер..." if is_sticker else "⏳ Переворачиваем время...")
+    if not await reverse_video(
+        vid_path=input_file, output_path=output_file, memory_budget=_reverse_budget(job.ctx)
+    ):
+        await job.message.answer("Ошибка при реверсе стикера" if is_sticker else "Ошибка при реверсе видео")
+        return False
+    # Plain videos go back as videos; GIFs, video notes and stickers as animations.
+    if job.source.kind == VIDEO:
+        await job.message.answer_video(FSInputFile(output_file))
+    else:
+        await job.message.answer_animation(FSInputFile(output_file))
+    return True
+
+
+async def _tenet_unsupported(job: _TenetJob) -> bool:
+    if job.source.kind == TGS_STICKER:
+        await job.message.answer("TGS стикеры пока не поддерживаются для /tenet")
+    else:
+        await job.message.answer(f"Не знаю как перевернуть этот тип файла: {job.source.mime_type}")
+    return False
+
+
+# Kinds answered without a media slot or scratch directory.
+_INSTANT_KINDS = frozenset({LOCATION, TEXT, TGS_STICKER, DOCUMENT})
+
+_STRATEGIES: dict[str, Callable[[_TenetJob], Awaitable[bool]]] = {
+    LOCATION: _tenet_location,
+    TEXT: _tenet_text,
+    IMAGE: _tenet_image,
+    STATIC_STICKER: _tenet_image,
+    VOICE: _tenet_audio,
+    AUDIO: _tenet_audio,
+    PDF: _tenet_pdf,
+    TEXT_FILE: _tenet_text_file,
+    VIDEO: _tenet_video,
+    ANIMATION: _tenet_video,
+    VIDEO_NOTE: _tenet_video,
+    VIDEO_STICKER: _tenet_video,
+    TGS_STICKER: _tenet_unsupported,
+    DOCUMENT: _tenet_unsupported,
+}
+
+
+async def _cmd_tenet_in(
+    message: Message, bot: Bot, ctx: AppContext, *, work: Path | None, source: MediaSource | None
+) -> None:
+    if source is None:
         await message.answer("Не могу обработать этот тип сообщения")
+        return
 
+    status_msg = await message.reply("⏳ Обрабатываем в стиле Тенет...")
+    job = _TenetJob(message=message, bot=bot, ctx=ctx, work=work, source=source, status=status_msg)
+    processed_ok = False
+
+    try:
+        processed_ok = await _STRATEGIES[source.kind](job)
+    except DownloadTooLargeError as e:
+        logging.info("Refused to download media: %s", e)
+        await message.answer(f"⚠️ Файл слишком большой (максимум {e.limit_mb} МБ)")
     except Exception as e:
         logging.error("Tenet command error: %s", e, exc_info=True)
         await message.answer("Произошла ошибка при обработке")
@@ -283,13 +248,6 @@ async def cmd_tenet(message: Message, bot: Bot, ctx: AppContext) -> None:
         except Exception:
             pass
 
-        for f in (input_file, output_file):
-            try:
-                if os.path.exists(f):
-                    os.remove(f)
-            except Exception:
-                pass
-
         if processed_ok and message.from_user:
             try:
                 await ctx.rating.add_points(user=message.from_user, delta=1)
@@ -1,20 +1,53 @@
 from __future__ import annotations
 
-import os
+import asyncio
+from dataclasses import dataclass
 import logging
 
 from aiogram import Bot, Router
 from aiogram.filters import Command
-from aiogram.types import FSInputFile, Message
+from aiogram.types import BufferedInputFile, Message
 
 from app.context import AppContext
-from demotivator.trump_tweet import create_trump_tweet_image, download_user_avatar
-from utils.asyncio_utils import run_in_thread
+from services.avatar_cache import TWEET
+from services.groq_service import trump_fallback_text
 
 
 router = Router(name="trump")
 
 
+@dataclass(frozen=True)
+class _Tweet:
+    text: str
+    image: bytes | None
+    # False when the LLM failed and `text` is the local stand-in.
+    llm_ok: bool
+    # False when the card shows the placeholder circle instead of the user's avatar.
+    has_avatar: bool
+
+
+async def _trumpify(ctx: AppContext, original: str) -> str | None:
+    # Keyed by text alone, so it can start before the avatar (and thus the card key) is known.
+    return await ctx.trump_texts.get(
+        original,
+        lambda: ctx.groq.trumpify_text(original_text=original, fallback=False),
+        cache_if=lambda text: text is not None,
+    )
+
+
+async def _make_tweet(bot: Bot, ctx: AppContext, *, original: str, user_id: int) -> _Tweet:
+    # Joins the LLM call the handler already started; the avatar download and resize overlap with it.
+    trumpified, avatar = await asyncio.gather(_trumpify(ctx, original), ctx.avatars.get(bot, user_id, TWEET))
+    text = trumpified if trumpified is not None else trump_fallback_text(original)
+    image = await ctx.render.trump_tweet(text=text, avatar=avatar)
+    return _Tweet(
+        text=text,
+        image=image,
+        llm_ok=trumpified is not None and image is not None,
+        has_avatar=avatar is not None,
+    )
+
+
 @router.message(Command("trump", "трамп"))
 async def cmd_trump(message: Message, bot: Bot, ctx: AppContext) -> None:
     if not message.from_user:
@@ -36,24 +69,29 @@ async def cmd_trump(message: Message, bot: Bot, ctx: AppContext) -> None:
 
     status_msg = await message.reply("⏳ MAKING AMERICA GREAT AGAIN...")
 
-    output_path = f"temp_trump_tweet_{message.message_id}.png"
-    avatar_path = f"temp_trump_avatar_{message.message_id}.jpg"
-
     processed_ok = False
     try:
-        trumpified = await run_in_thread(ctx.groq.trumpify_text, original_text=original)
-        await download_user_avatar(bot=bot, user_id=user_id, output_path=avatar_path)
-
-        img_ok = await run_in_thread(
-            create_trump_tweet_image,
-            text=trumpified,
-            output_path=output_path,
-            avatar_path=avatar_path,
-        )
+        # Start the LLM call now, alongside the profile photo lookup that keys the card;
+        # the card factory joins it through the text cache instead of starting another.
+        text_task = asyncio.create_task(_trumpify(ctx, original))
+        try:
+            photo_id = await ctx.avatars.photo_id(bot, user_id)
+            # Several people /trump-ing the same message share one LLM call and one render.
+            # Cards with a stand-in text or a placeholder avatar are not cached.
+            result = await ctx.trump_tweets.get(
+                (original, photo_id),
+                lambda: _make_tweet(bot, ctx, original=original, user_id=user_id),
+                cache_if=lambda t: t.llm_ok and (t.has_avatar or photo_id is None),
+            )
+        finally:
+            # Only still pending on a card cache hit. This drops just our wait: the shared LLM
+            # call is shielded in the text cache, finishes and is cached for next time.
+            text_task.cancel()
+        trumpified, tweet = result.text, result.image
 
-        if img_ok:
+        if tweet:
             await message.answer_photo(
-                FSInputFile(output_path),
+                BufferedInputFile(tweet, filename="tweet.png"),
                 caption="🇺🇸 **TRUMP MODE ACTIVATED** 🇺🇸",
                 parse_mode="Markdown",
             )
@@ -71,13 +109,6 @@ async def cmd_trump(message: Message, bot: Bot, ctx: AppContext) -> None:
         except Exception:
             pass
 
-        for f in (output_path, avatar_path):
-            try:
-                if os.path.exists(f):
-                    os.remove(f)
-            except Exception:
-                pass
-
         if processed_ok:
             try:
                 await ctx.rating.add_points(user=message.from_user, delta=1)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from config.config import Settings
+from demotivator.encoding import PROFILES
+from demotivator.layout import LayoutConfig
+from demotivator.video_creator import create_demotivator_video
+from utils.logging_setup import configure_logging
+
+
+async def bench(*, clips: list[Path], profiles: list[str], text: str, layout_cfg: LayoutConfig) -> list[tuple]:
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="bench_enc_") as tmp:
+        for clip in clips:
+            for name in profiles:
+                profile = PROFILES[name]
+                # None = the preset the profile would pick on its own.
+                for preset in (None, profile.fast, profile.compact):
+                    out = os.path.join(tmp, "out.mp4")
+                    start = time.monotonic()
+                    ok = await create_demotivator_video(
+                        vid_path=str(clip),
+                        text=text,
+                        output_path=out,
+                        layout_cfg=layout_cfg,
+                        profile=profile,
+                        preset=preset,
+                    )
+                    elapsed = time.monotonic() - start
+                    size = os.path.getsize(out) if ok and os.path.exists(out) else 0
+                    rows.append((clip.name, name, preset.name if preset else "auto", ok, elapsed, size))
+                    if os.path.exists(out):
+                        os.remove(out)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare encode time and output size of video demotivator profiles")
+    parser.add_argument("clips", nargs="+", type=Path, help="Sample video files")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES), help="Profile(s) to test (default: all)")
+    parser.add_argument("--text", default="ДЕМОТИВАТОР\nтестовая подпись", help="Caption to render")
+    args = parser.parse_args()
+
+    load_dotenv()
+    base_dir = Path(__file__).resolve().parents[1]
+    settings = Settings.from_env(base_dir=base_dir)
+    configure_logging(log_file=settings.log_file)
+    layout_cfg = LayoutConfig(font_paths=settings.font_paths, unicode_font_paths=settings.unicode_font_paths)
+
+    missing = [c for c in args.clips if not c.exists()]
+    if missing:
+        raise SystemExit(f"Clip not found: {missing[0]}")
+
+    rows = asyncio.run(
+        bench(clips=args.clips, profiles=args.profile or sorted(PROFILES), text=args.text, layout_cfg=layout_cfg)
+    )
+
+    print(f"{'clip':<30} {'profile':<10} {'preset':<8} {'ok':<3} {'time,s':>7} {'size,KB':>9}")
+    for clip, profile, preset, ok, elapsed, size in rows:
+        print(f"{clip[:30]:<30} {profile:<10} {preset:<8} {'+' if ok else '-':<3} {elapsed:>7.2f} {size / 1024:>9.1f}")
+    logging.info("Encoding benchmark finished: %s runs", len(rows))
+
+
+if __name__ == "__main__":
+    main()
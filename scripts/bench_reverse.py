@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from utils.ffmpeg import run_ffmpeg
+from utils.logging_setup import configure_logging
+from utils.tenet import reverse_video
+
+
+# A budget no clip reaches, i.e. the old single-pass reverse.
+_UNBOUNDED = 1 << 62
+# Frames are compared as small grayscale thumbnails; two lossy encodes of the same
+# frame stay well under this mean difference, different testsrc2 frames do not.
+_THUMB_SIZE = (64, 36)
+_MAX_MEAN_DIFF = 6.0
+
+
+async def _make_clip(path: str, *, duration: float, size: str, fps: int, gop: int) -> None:
+    result = await run_ffmpeg(
+        [
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={size}:rate={fps}:duration={duration}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency=440:duration={duration}",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "ultrafast",
+            "-g",
+            str(gop),
+            "-c:a",
+            "aac",
+            "-shortest",
+            path,
+        ],
+        timeout=300,
+        label="ffmpeg bench clip",
+    )
+    if not result.ok:
+        raise SystemExit(f"Failed to generate {path}")
+
+
+async def _thumbnails(path: str) -> list[bytes]:
+    width, height = _THUMB_SIZE
+    result = await run_ffmpeg(
+        ["-i", path, "-vf", f"scale={width}:{height},format=gray", "-f", "rawvideo", "pipe:1"],
+        timeout=300,
+        label="ffmpeg bench thumbnails",
+        capture_stdout=True,
+    )
+    if not result.ok:
+        return []
+    size = width * height
+    return [result.stdout[i : i + size] for i in range(0, len(result.stdout) - size + 1, size)]
+
+
+def _mismatch(source: list[bytes], output: list[bytes]) -> str | None:
+    """Why `output` is not `source` played backwards; None if it is."""
+    if not output:
+        return "no frames decoded"
+    if len(output) != len(source):
+        return f"{len(output)} frames, expected {len(source)}"
+    for i, (expected, actual) in enumerate(zip(reversed(source), output)):
+        diff = sum(abs(a - b) for a, b in zip(expected, actual)) / len(expected)
+        if diff > _MAX_MEAN_DIFF:
+            return f"output frame {i} is not input frame {len(source) - 1 - i} (mean diff {diff:.1f})"
+    return None
+
+
+def _run_case(clip: str, output: str, memory_budget: int) -> tuple[bool, float, int]:
+    # Runs in a fresh process: RUSAGE_CHILDREN then covers only this case's ffmpeg runs.
+    start = time.monotonic()
+    ok = asyncio.run(
+        reverse_video(vid_path=clip, output_path=output, max_duration=3600, memory_budget=memory_budget)
+    )
+    elapsed = time.monotonic() - start
+    return ok, elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def bench(*, durations: list[float], size: str, fps: int, gop: int, budget_mb: int) -> list[tuple]:
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="bench_rev_") as tmp:
+        output = os.path.join(tmp, "out.mp4")
+        for duration in durations:
+            clip = os.path.join(tmp, f"clip_{duration:g}s.mp4")
+            asyncio.run(_make_clip(clip, duration=duration, size=size, fps=fps, gop=gop))
+            source = asyncio.run(_thumbnails(clip))
+            for mode, budget in (("single", _UNBOUNDED), ("segmented", budget_mb * 1024 * 1024)):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    ok, elapsed, peak_kb = pool.submit(_run_case, clip, output, budget).result()
+                # Checked after the case so the thumbnail decode does not count towards its peak RSS.
+                problem = _mismatch(source, asyncio.run(_thumbnails(output))) if ok else "reverse failed"
+                if os.path.exists(output):
+                    os.remove(output)
+                rows.append((duration, mode, problem is None, elapsed, peak_kb, problem or ""))
+            os.remove(clip)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Peak ffmpeg RSS of /tenet video reverse as input duration grows")
+    parser.add_argument("--duration", action="append", type=float, help="Clip length, s (default: 5 10 20 30)")
+    parser.add_argument("--size", default="1280x720", help="Synthetic clip size (default 1280x720)")
+    parser.add_argument("--fps", type=int, default=30, help="Synthetic clip frame rate (default 30)")
+    parser.add_argument("--gop", type=int, help="Keyframe interval of the clip, frames (default: one second)")
+    parser.add_argument("--budget-mb", type=int, default=384, help="Memory budget for segmented mode (default 384)")
+    args = parser.parse_args()
+
+    configure_logging(log_file=Path(tempfile.gettempdir()) / "bench_reverse.log")
+    rows = bench(
+        durations=args.duration or [5, 10, 20, 30],
+        size=args.size,
+        fps=args.fps,
+        gop=args.gop or args.fps,
+        budget_mb=args.budget_mb,
+    )
+
+    # Peak RSS is per ffmpeg process; segmented mode runs up to two at once. `ok` means the
+    # output is the input played backwards frame for frame, not just that ffmpeg succeeded.
+    print(f"{'duration,s':>10} {'mode':<10} {'ok':<3} {'time,s':>7} {'peak RSS,MB':>12}")
+    for duration, mode, ok, elapsed, peak_kb, problem in rows:
+        print(f"{duration:>10g} {mode:<10} {'+' if ok else '-':<3} {elapsed:>7.2f} {peak_kb / 1024:>12.1f} {problem}")
+    logging.info("Reverse benchmark finished: %s runs", len(rows))
+    if not all(row[2] for row in rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Static assets uploaded to Telegram once and resent by file_id afterwards."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from pathlib import Path
+import sqlite3
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, Message
+
+from utils.asyncio_utils import run_in_thread
+
+
+class AssetRegistryStorage:
+    def __init__(self, *, db_path: Path) -> None:
+        self._db_path = db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self) -> None:
+        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS assets (
+                    key TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    updated_at INTEGER NOT NULL
+                )
+                """
+            )
+
+    def load_all(self) -> dict[str, str]:
+        with self._connect() as conn:
+            return {row["key"]: row["file_id"] for row in conn.execute("SELECT key, file_id FROM assets")}
+
+    def put(self, key: str, file_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO assets(key, file_id, updated_at) VALUES(?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET file_id=excluded.file_id, updated_at=excluded.updated_at
+                """,
+                (key, file_id, int(time.time())),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM assets WHERE key=?", (key,))
+
+
+def _file_key(kind: str, path: Path) -> str:
+    # A replaced file (new size/mtime) gets a new key and is uploaded again.
+    stat = path.stat()
+    return f"{kind}:{path.resolve()}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def _bytes_key(kind: str, name: str, data: bytes, *, owner: int) -> str:
+    return f"{kind}:{name}:{hashlib.sha256(data).hexdigest()[:16]}:{owner}"
+
+
+class AssetRegistry:
+    """Remembers Telegram file_ids of static assets (overload pictures, spacer stickers).
+
+    The first send uploads the file and stores the returned file_id; later sends
+    reuse it, which matters most when the bot is already overloaded.
+    """
+
+    def __init__(self, *, db_path: Path) -> None:
+        self._storage = AssetRegistryStorage(db_path=db_path)
+        self._file_ids: dict[str, str] = {}
+
+    def init_db(self) -> None:
+        self._storage.init_db()
+        self._file_ids = self._storage.load_all()
+
+    async def _remember(self, key: str, file_id: str) -> None:
+        self._file_ids[key] = file_id
+        try:
+            await run_in_thread(self._storage.put, key, file_id)
+        except Exception as e:
+            logging.error("Failed to store asset file_id: %s", e, exc_info=True)
+
+    async def _forget(self, key: str) -> None:
+        self._file_ids.pop(key, None)
+        try:
+            await run_in_thread(self._storage.delete, key)
+        except Exception as e:
+            logging.error("Failed to delete asset file_id: %s", e, exc_info=True)
+
+    async def answer_photo(self, message: Message, path: Path, *, caption: str | None = None) -> None:
+        """Send a local picture as a photo, uploading it only the first time."""
+        key = _file_key("photo", path)
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            try:
+                await message.answer_photo(file_id, caption=caption)
+                return
+            except TelegramBadRequest as e:
+                logging.warning("Stored file_id for %s is no longer valid: %s", path, e)
+                await self._forget(key)
+
+        sent = await message.answer_photo(FSInputFile(str(path)), caption=caption)
+        if sent.photo:
+            await self._remember(key, sent.photo[-1].file_id)
+
+    async def sticker_file(
+        self, bot: Bot, *, user_id: int, name: str, data: bytes, sticker_format: str = "static"
+    ) -> str | None:
+        """file_id of an uploaded sticker file for InputSticker; None if the upload failed.
+
+        upload_sticker_file uploads on behalf of `user_id`, so file_ids are kept per user.
+        """
+        key = _bytes_key(f"sticker_{sticker_format}", name, data, owner=user_id)
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            return file_id
+
+        try:
+            uploaded = await bot.upload_sticker_file(
+                user_id=user_id,
+                sticker=BufferedInputFile(data, filename=name),
+                sticker_format=sticker_format,
+            )
+        except Exception as e:
+            logging.error("Failed to upload sticker asset %s: %s", name, e, exc_info=True)
+            return None
+
+        await self._remember(key, uploaded.file_id)
+        return uploaded.file_id
+
+    async def invalidate_sticker_file(
+        self, *, user_id: int, name: str, data: bytes, sticker_format: str = "static"
+    ) -> None:
+        await self._forget(_bytes_key(f"sticker_{sticker_format}", name, data, owner=user_id))
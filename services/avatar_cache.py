@@ -0,0 +1,89 @@
+"""Profile photos of chat members, kept resized for the renderers that use them."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+
+from aiogram import Bot
+from aiogram.types import PhotoSize
+
+from demotivator.image_creator import AVATAR_SIDE, prepare_demotivator_avatar
+from demotivator.trump_tweet import prepare_tweet_avatar
+from services.render_service import RenderService
+from utils.asyncio_utils import SingleFlightCache
+from utils.downloads import download_bytes, pick_photo_size
+
+
+# How long "which photo is current" is trusted before asking Telegram again.
+_LOOKUP_TTL_SECONDS = 5 * 60
+
+
+@dataclass(frozen=True)
+class AvatarVariant:
+    name: str
+    # Smallest profile photo size worth downloading for this variant.
+    min_side: int
+    # Module-level bytes -> bytes function, run in the render pool.
+    prepare: Callable[[bytes], bytes | None]
+
+
+DEMOTIVATOR = AvatarVariant("demotivator", AVATAR_SIDE, prepare_demotivator_avatar)
+# A 48px circle; a 96px source keeps it sharp.
+TWEET = AvatarVariant("tweet", 96, prepare_tweet_avatar)
+
+
+class AvatarCache:
+    """Current profile photo of a user, downloaded and resized once per variant.
+
+    Entries are keyed by the photo's file_unique_id, so a changed avatar is
+    picked up as soon as the profile lookup (cached for a few minutes) sees it.
+    Images live for `ttl_seconds`, at most `max_entries` of them.
+    """
+
+    def __init__(self, *, render: RenderService, ttl_seconds: float, max_entries: int) -> None:
+        self._render = render
+        self._photos: SingleFlightCache[list[PhotoSize] | None] = SingleFlightCache(
+            ttl_seconds=min(ttl_seconds, _LOOKUP_TTL_SECONDS), max_entries=max_entries
+        )
+        self._images: SingleFlightCache[bytes | None] = SingleFlightCache(
+            ttl_seconds=ttl_seconds, max_entries=max_entries
+        )
+
+    async def _lookup(self, bot: Bot, user_id: int) -> list[PhotoSize] | None:
+        photos = await bot.get_user_profile_photos(user_id, limit=1)
+        if photos.total_count == 0 or not photos.photos:
+            return None
+        return photos.photos[0]
+
+    async def _prepare(self, bot: Bot, photo: PhotoSize, variant: AvatarVariant) -> bytes | None:
+        return await self._render.run(variant.prepare, await download_bytes(bot, photo))
+
+    async def _sizes(self, bot: Bot, user_id: int) -> list[PhotoSize] | None:
+        return await self._photos.get(user_id, lambda: self._lookup(bot, user_id))
+
+    async def photo_id(self, bot: Bot, user_id: int) -> str | None:
+        """file_unique_id of the user's current profile photo, for keying renders that include it."""
+        try:
+            sizes = await self._sizes(bot, user_id)
+        except Exception as e:
+            logging.error("Failed to look up avatar: %s", e, exc_info=True)
+            return None
+        return sizes[-1].file_unique_id if sizes else None
+
+    async def get(self, bot: Bot, user_id: int, variant: AvatarVariant) -> bytes | None:
+        """The avatar prepared for `variant`; None if the user has none or it could not be fetched."""
+        try:
+            sizes = await self._sizes(bot, user_id)
+            if not sizes:
+                return None
+            photo = pick_photo_size(sizes, min_side=variant.min_side)
+            return await self._images.get(
+                (user_id, photo.file_unique_id, variant.name),
+                lambda: self._prepare(bot, photo, variant),
+                cache_if=lambda image: image is not None,
+            )
+        except Exception as e:
+            logging.error("Failed to fetch avatar: %s", e, exc_info=True)
+            return None
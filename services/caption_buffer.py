@@ -0,0 +1,113 @@
+"""Pre-generated AI captions for solo /d, persisted across restarts."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import logging
+from pathlib import Path
+import sqlite3
+
+from services.groq_service import GroqService
+from utils.asyncio_utils import run_in_thread
+
+
+_RETRY_DELAY_SECONDS = 60.0
+
+
+class CaptionBufferStorage:
+    def __init__(self, *, db_path: Path) -> None:
+        self._db_path = db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._db_path, timeout=10)
+
+    def init_db(self) -> None:
+        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS captions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    text TEXT NOT NULL
+                )
+                """
+            )
+
+    def load_all(self) -> list[tuple[int, str]]:
+        with self._connect() as conn:
+            return list(conn.execute("SELECT id, text FROM captions ORDER BY id"))
+
+    def add_many(self, texts: list[str]) -> list[int]:
+        with self._connect() as conn:
+            return [conn.execute("INSERT INTO captions(text) VALUES(?)", (text,)).lastrowid for text in texts]
+
+    def delete(self, caption_id: int) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM captions WHERE id=?", (caption_id,))
+
+
+class CaptionBuffer:
+    """A bounded queue of captions generated ahead of time, `batch` phrases per LLM request.
+
+    `take()` never waits; when the buffer drops to `low_water` the refill loop
+    asks for another batch. Captions not used before a restart are reloaded.
+    """
+
+    def __init__(
+        self, *, groq: GroqService, db_path: Path, size: int, batch: int = 10, low_water: int | None = None
+    ) -> None:
+        self._groq = groq
+        self._storage = CaptionBufferStorage(db_path=db_path)
+        self._size = max(0, size)
+        self._batch = max(1, batch)
+        self._low_water = low_water if low_water is not None else self._size // 2
+        self._items: deque[tuple[int, str]] = deque()
+        self._wanted = asyncio.Event()
+
+    def init_db(self) -> None:
+        self._storage.init_db()
+        self._items.extend(self._storage.load_all())
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def take(self) -> str | None:
+        if not self._items:
+            self._wanted.set()
+            return None
+        caption_id, text = self._items.popleft()
+        if len(self._items) <= self._low_water:
+            self._wanted.set()
+        try:
+            await run_in_thread(self._storage.delete, caption_id)
+        except Exception as e:
+            logging.error("Failed to delete buffered caption: %s", e, exc_info=True)
+        return text
+
+    async def _refill(self) -> bool:
+        count = min(self._batch, self._size - len(self._items))
+        texts = await self._groq.generate_demotivator_texts(count)
+        if not texts:
+            return False
+        ids = await run_in_thread(self._storage.add_many, texts)
+        self._items.extend(zip(ids, texts))
+        return True
+
+    async def run(self) -> None:
+        """Refill loop; runs until cancelled."""
+        if self._size == 0 or not self._groq.enabled():
+            return
+        while True:
+            while len(self._items) < self._size:
+                try:
+                    ok = await self._refill()
+                except Exception as e:
+                    logging.warning("Caption buffer refill failed: %s", e)
+                    ok = False
+                if not ok:
+                    await asyncio.sleep(_RETRY_DELAY_SECONDS)
+            self._wanted.clear()
+            if len(self._items) <= self._low_water:
+                continue
+            await self._wanted.wait()
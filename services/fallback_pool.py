@@ -0,0 +1,107 @@
+"""Warm pool of already downloaded random stickers for solo /d."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import logging
+from pathlib import Path
+import random
+import shutil
+import uuid
+
+from aiogram import Bot
+
+from services.sticker_sets import StickerSetCache
+from utils.downloads import download_bytes, download_file
+from utils.ffmpeg import MediaInfo, probe_media
+from utils.fallback_media import FALLBACK_STICKER_PACKS, usable_fallback_sticker
+
+
+_RETRY_DELAY_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class FallbackMedia:
+    # Exactly one of `data` (still image bytes) or `video_path` (a .webm the caller owns) is set.
+    data: bytes | None = None
+    video_path: str | None = None
+    info: MediaInfo | None = None
+
+
+class FallbackStickerPool:
+    """Keeps `size` random stickers downloaded (videos also probed) ahead of time.
+
+    `take()` never waits: it returns a ready item or None, and wakes the refill
+    loop, which downloads a replacement in the background.
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int,
+        directory: Path,
+        sticker_sets: StickerSetCache,
+        fallback_avatar: Path,
+        prefer_local_probability: float = 0.02,
+    ) -> None:
+        self._size = max(0, size)
+        self._dir = directory
+        self._sticker_sets = sticker_sets
+        self._fallback_avatar = fallback_avatar
+        self._prefer_local_probability = prefer_local_probability
+        self._items: deque[FallbackMedia] = deque()
+        self._wanted = asyncio.Event()
+
+    def prepare(self) -> None:
+        # Files left from a previous run are not tracked by anyone: start clean.
+        shutil.rmtree(self._dir, ignore_errors=True)
+        self._dir.mkdir(parents=True, exist_ok=True)
+
+    def take(self, *, image_only: bool = False) -> FallbackMedia | None:
+        item = next((i for i in self._items if not image_only or i.data is not None), None)
+        if item is not None:
+            self._items.remove(item)
+        self._wanted.set()
+        return item
+
+    async def _fetch(self, bot: Bot) -> FallbackMedia | None:
+        if random.random() < self._prefer_local_probability and self._fallback_avatar.exists():
+            return FallbackMedia(data=self._fallback_avatar.read_bytes())
+
+        sticker = await self._sticker_sets.random_sticker(
+            bot, FALLBACK_STICKER_PACKS, predicate=usable_fallback_sticker
+        )
+        if sticker is None:
+            return None
+        if sticker.is_animated:
+            return FallbackMedia(data=await download_bytes(bot, sticker.thumbnail_file_id))
+        if not sticker.is_video:
+            return FallbackMedia(data=await download_bytes(bot, sticker.file_id))
+
+        video_path = str(self._dir / f"{uuid.uuid4().hex}.webm")
+        await download_file(bot, sticker.file_id, video_path)
+        info = await probe_media(video_path)
+        if info is None:
+            Path(video_path).unlink(missing_ok=True)
+            return None
+        return FallbackMedia(video_path=video_path, info=info)
+
+    async def run(self, bot: Bot) -> None:
+        """Refill loop; runs until cancelled."""
+        if self._size == 0:
+            return
+        while True:
+            while len(self._items) < self._size:
+                try:
+                    item = await self._fetch(bot)
+                except Exception as e:
+                    logging.warning("Fallback sticker prefetch failed: %s", e)
+                    item = None
+                if item is None:
+                    await asyncio.sleep(_RETRY_DELAY_SECONDS)
+                    continue
+                self._items.append(item)
+            self._wanted.clear()
+            await self._wanted.wait()
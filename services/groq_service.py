@@ -1,70 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import random
+import re
 
-from groq import Groq
+import groq
+from groq import AsyncGroq
 
 
-class GroqService:
-    def __init__(self, *, api_key: str) -> None:
-        self._client = Groq(api_key=api_key) if api_key else None
+_MODEL = "llama-3.3-70b-versatile"
+_RETRY_BASE_DELAY_SECONDS = 0.3
+# Errors worth another attempt; anything else (bad key, bad request) fails at once.
+_RETRYABLE = (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
 
-    def enabled(self) -> bool:
-        return self._client is not None
+_DEMOTIVATOR_SYSTEM_PROMPT = "Ты генератор текста для демотиваторов. Пиши кратко, саркастично, по-русски."
+_DEMOTIVATOR_PROMPTS = (
+    "напиши какой-нибудь рофл рофлянский",
+    "напиши какую-нибудь шизу до 8 слов",
+)
+_DEMOTIVATOR_BATCH_PROMPT = (
+    "напиши {count} разных фраз для демотиваторов: рофлы рофлянские и шизу до 8 слов. "
+    "Каждая фраза с новой строки, без нумерации, кавычек и пояснений"
+)
+# Numbering or bullets the model adds anyway.
+_LIST_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
 
-    def generate_demotivator_text(self) -> str:
-        """Generate a short phrase for a demotivator."""
-        if not self._client:
-            return random.choice(
-                [
-                    "Жизнь - боль",
-                    "Всё тленно",
-                    "Ничего не вечно",
-                    "Надежда умирает последней",
-                ]
-            )
-
-        try:
-            prompts = [
-                "напиши какой-нибудь рофл рофлянский",
-                "напиши какую-нибудь шизу до 8 слов",
-            ]
-
-            response = self._client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Ты генератор текста для демотиваторов. Пиши кратко, саркастично, по-русски.",
-                    },
-                    {"role": "user", "content": random.choice(prompts)},
-                ],
-                max_tokens=50,
-                temperature=1.2,
-            )
-
-            text = response.choices[0].message.content.strip()
-            text = text.strip('"').strip("'").strip()
-
-            words = text.split()
-            if len(words) > 10:
-                text = " ".join(words[:10]) + "..."
-
-            logging.info("Generated text: %s", text)
-            return text
-
-        except Exception as e:
-            logging.error("Groq generation error: %s", e, exc_info=True)
-            return random.choice(["Всё сложно", "Бывает", "Жизнь - боль", "Ничего не вечно"])
-
-    def trumpify_text(self, *, original_text: str) -> str:
-        """Rewrite text in the style of Donald Trump."""
-        if not self._client:
-            return f"{original_text} Tremendous! 🇺🇸"
-
-        try:
-            prompt = f"""Перепиши текст в стиле твитов Дональда Трампа. Точно копируй его манеру!
+_TRUMP_PROMPT = """Перепиши текст в стиле твитов Дональда Трампа. Точно копируй его манеру!
 
 ОБЯЗАТЕЛЬНЫЕ элементы стиля:
 - ЗАГЛАВНЫЕ слова для усиления (VERY, GREAT, FAKE NEWS, TERRIBLE, etc)
@@ -81,27 +43,159 @@ class GroqService:
 
 Ответ (только переписанный текст без комментариев):"""
 
-            response = self._client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You write EXACTLY like Donald Trump tweets. Use his style: CAPS, "
-                            "superlatives, short sentences, confidence, drama. Add 1-2 🇺🇸 flags."
-                        ),
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                max_tokens=350,
-                temperature=1.0,
-            )
-
-            result = response.choices[0].message.content.strip()
-            result = result.strip('"').strip("'").strip()
-            result = result.replace("**", "")
-            return result
-
-        except Exception as e:
-            logging.error("Trumpify error: %s", e, exc_info=True)
-            return f"{original_text} - FAKE NEWS! 🇺🇸"
+_FALLBACK_PHRASES = (
+    "Жизнь - боль",
+    "Всё тленно",
+    "Ничего не вечно",
+    "Надежда умирает последней",
+    "Всё сложно",
+    "Бывает",
+)
+
+
+def trump_fallback_text(original_text: str) -> str:
+    """What /trump shows when the LLM could not be reached."""
+    return f"{original_text} - FAKE NEWS! 🇺🇸"
+
+
+def _clean_phrase(text: str) -> str:
+    text = text.strip().strip("\"'«»").strip()
+    words = text.split()
+    if len(words) > 10:
+        text = " ".join(words[:10]) + "..."
+    return text
+
+
+class GroqService:
+    """Async Groq client: one pooled HTTP client, retries with backoff, and a hard deadline per call.
+
+    When the deadline passes (or the API is not configured) the caller gets a
+    local fallback immediately instead of waiting on the LLM.
+    """
+
+    def __init__(self, *, api_key: str, deadline_seconds: float = 8.0, max_attempts: int = 3) -> None:
+        # Retries are ours, so they fit in the deadline; the SDK's own would not.
+        self._client = AsyncGroq(api_key=api_key, max_retries=0, timeout=deadline_seconds) if api_key else None
+        self._deadline = deadline_seconds
+        self._max_attempts = max(1, max_attempts)
+
+    def enabled(self) -> bool:
+        return self._client is not None
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+    async def _complete(
+        self, *, messages: list[dict], max_tokens: int, temperature: float, deadline: float | None = None
+    ) -> str | None:
+        """One chat completion within the deadline; None if it could not be had in time."""
+        deadline = deadline if deadline is not None else self._deadline
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        for attempt in range(self._max_attempts):
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                response = await asyncio.wait_for(
+                    self._client.chat.completions.create(
+                        model=_MODEL,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        timeout=remaining,
+                    ),
+                    timeout=remaining,
+                )
+                return (response.choices[0].message.content or "").strip()
+            except asyncio.TimeoutError:
+                logging.warning("Groq request missed its %.1fs deadline", deadline)
+                return None
+            except _RETRYABLE as e:
+                delay = _RETRY_BASE_DELAY_SECONDS * 2**attempt * random.uniform(0.8, 1.2)
+                if loop.time() + delay >= end or attempt + 1 == self._max_attempts:
+                    logging.warning("Groq request failed, giving up: %s", e)
+                    return None
+                logging.warning("Groq request failed (attempt %s), retrying in %.2fs: %s", attempt + 1, delay, e)
+                await asyncio.sleep(delay)
+            except Exception as e:
+                logging.error("Groq request error: %s", e, exc_info=True)
+                return None
+        return None
+
+    async def generate_demotivator_text(self) -> str:
+        """Generate a short phrase for a demotivator."""
+        if not self._client:
+            return random.choice(_FALLBACK_PHRASES)
+
+        text = await self._complete(
+            messages=[
+                {"role": "system", "content": _DEMOTIVATOR_SYSTEM_PROMPT},
+                {"role": "user", "content": random.choice(_DEMOTIVATOR_PROMPTS)},
+            ],
+            max_tokens=50,
+            temperature=1.2,
+        )
+        if not text:
+            return random.choice(_FALLBACK_PHRASES)
+
+        text = _clean_phrase(text) or random.choice(_FALLBACK_PHRASES)
+        logging.info("Generated text: %s", text)
+        return text
+
+    async def generate_demotivator_texts(self, count: int, *, deadline: float = 30.0) -> list[str]:
+        """Up to `count` distinct phrases from a single request; [] when the API is off or failing.
+
+        Meant for background refills, hence the longer deadline and no local fallback.
+        """
+        if not self._client or count <= 0:
+            return []
+
+        text = await self._complete(
+            messages=[
+                {"role": "system", "content": _DEMOTIVATOR_SYSTEM_PROMPT},
+                {"role": "user", "content": _DEMOTIVATOR_BATCH_PROMPT.format(count=count)},
+            ],
+            max_tokens=40 * count,
+            temperature=1.2,
+            deadline=deadline,
+        )
+        phrases: list[str] = []
+        for line in (text or "").splitlines():
+            phrase = _clean_phrase(_LIST_MARKER.sub("", line))
+            if phrase and phrase not in phrases:
+                phrases.append(phrase)
+        logging.info("Generated %s demotivator phrases", len(phrases))
+        return phrases[:count]
+
+    async def trumpify_text(self, *, original_text: str, fallback: bool = True) -> str | None:
+        """Rewrite text in the style of Donald Trump.
+
+        With `fallback=False` a failed call gives None instead of
+        `trump_fallback_text`, so callers can avoid caching the stand-in.
+        """
+        if not self._client:
+            return f"{original_text} Tremendous! 🇺🇸"
+
+        prompt = _TRUMP_PROMPT.format(original_text=original_text)
+
+        result = await self._complete(
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You write EXACTLY like Donald Trump tweets. Use his style: CAPS, "
+                        "superlatives, short sentences, confidence, drama. Add 1-2 🇺🇸 flags."
+                    ),
+                },
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=350,
+            temperature=1.0,
+        )
+        if not result:
+            return trump_fallback_text(original_text) if fallback else None
+
+        result = result.strip('"').strip("'").strip()
+        return result.replace("**", "")
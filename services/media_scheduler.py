@@ -0,0 +1,157 @@
+"""Admission control for heavy media jobs (bounded concurrency + fair wait queue)."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import itertools
+import logging
+
+
+PRIORITY_IMAGE = 0
+PRIORITY_VIDEO = 1
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class QueueFullError(RuntimeError):
+    def __init__(self, *, queued: int, per_user: bool) -> None:
+        super().__init__(f"media queue is full ({queued} waiting, per_user={per_user})")
+        self.queued = queued
+        self.per_user = per_user
+
+
+@dataclass(eq=False)
+class _Waiter:
+    user_id: int
+    priority: int
+    seq: int
+    future: asyncio.Future[None]
+    on_position: PositionCallback | None
+    position: int = field(default=0)
+
+
+class MediaScheduler:
+    """Runs at most `max_concurrent` jobs; the rest wait in a bounded queue.
+
+    The next job is picked by (jobs the user already has running, priority, arrival),
+    so one user spamming /d cannot starve everyone else. A request is rejected only
+    when the queue is full or the user already has `max_per_user` jobs in flight.
+    """
+
+    def __init__(self, *, max_concurrent: int, max_queue: int, max_per_user: int) -> None:
+        self._max_concurrent = max(1, max_concurrent)
+        self._max_queue = max(0, max_queue)
+        self._max_per_user = max(1, max_per_user)
+        self._running = 0
+        self._running_by_user: dict[int, int] = {}
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        *,
+        user_id: int,
+        priority: int = PRIORITY_IMAGE,
+        on_position: PositionCallback | None = None,
+    ) -> AsyncIterator[None]:
+        """Hold one execution slot for the duration of the block."""
+        await self._acquire(user_id=user_id, priority=priority, on_position=on_position)
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    async def _acquire(self, *, user_id: int, priority: int, on_position: PositionCallback | None) -> None:
+        in_flight = self._running_by_user.get(user_id, 0) + sum(
+            1 for w in self._waiters if w.user_id == user_id
+        )
+        if in_flight >= self._max_per_user:
+            raise QueueFullError(queued=len(self._waiters), per_user=True)
+
+        if self._running < self._max_concurrent and not self._waiters:
+            self._start(user_id)
+            return
+
+        if len(self._waiters) >= self._max_queue:
+            raise QueueFullError(queued=len(self._waiters), per_user=False)
+
+        waiter = _Waiter(
+            user_id=user_id,
+            priority=priority,
+            seq=next(self._seq),
+            future=asyncio.get_running_loop().create_future(),
+            on_position=on_position,
+        )
+        self._waiters.append(waiter)
+        logging.info(
+            "Media job queued: user=%s priority=%s running=%s queued=%s",
+            user_id,
+            priority,
+            self._running,
+            len(self._waiters),
+        )
+        self._notify_positions()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._notify_positions()
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # The slot was granted right as we were cancelled: hand it on.
+                self._release(user_id)
+            raise
+
+    def _start(self, user_id: int) -> None:
+        self._running += 1
+        self._running_by_user[user_id] = self._running_by_user.get(user_id, 0) + 1
+
+    def _release(self, user_id: int) -> None:
+        self._running -= 1
+        left = self._running_by_user.get(user_id, 0) - 1
+        if left > 0:
+            self._running_by_user[user_id] = left
+        else:
+            self._running_by_user.pop(user_id, None)
+        self._dispatch()
+
+    def _order_key(self, waiter: _Waiter) -> tuple[int, int, int]:
+        return (self._running_by_user.get(waiter.user_id, 0), waiter.priority, waiter.seq)
+
+    def _dispatch(self) -> None:
+        while self._running < self._max_concurrent and self._waiters:
+            waiter = min(self._waiters, key=self._order_key)
+            self._waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            self._start(waiter.user_id)
+            waiter.future.set_result(None)
+        self._notify_positions()
+
+    def _notify_positions(self) -> None:
+        for position, waiter in enumerate(sorted(self._waiters, key=self._order_key), start=1):
+            if waiter.position == position or waiter.on_position is None:
+                waiter.position = position
+                continue
+            waiter.position = position
+            asyncio.get_running_loop().create_task(_safe_notify(waiter.on_position, position))
+
+
+async def _safe_notify(callback: PositionCallback, position: int) -> None:
+    try:
+        await callback(position)
+    except Exception:
+        logging.debug("Queue position callback failed", exc_info=True)
@@ -0,0 +1,164 @@
+"""Content-addressed cache of finished renders (Telegram file_id and/or output bytes)."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import logging
+from pathlib import Path
+import sqlite3
+import time
+
+from utils.asyncio_utils import run_in_thread
+
+
+# Bump whenever demotivator output changes, so stale renders are not resent.
+RENDERER_VERSION = 1
+
+# Output bytes are kept only for small results; big ones (videos) are cached by file_id alone.
+_MAX_STORED_BYTES = 2 * 1024 * 1024
+_MAX_ENTRIES = 50_000
+
+
+@dataclass(frozen=True)
+class CachedRender:
+    kind: str
+    file_id: str | None
+    data: bytes | None
+
+
+class RenderCacheStorage:
+    def __init__(self, *, root: Path, max_bytes: int) -> None:
+        self._root = root
+        self._db_path = root / "index.sqlite3"
+        self._max_bytes = max_bytes
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _data_path(self, key: str) -> Path:
+        return self._root / key[:2] / key
+
+    def init_db(self) -> None:
+        self._root.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS renders (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    file_id TEXT,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    accessed_at INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_renders_accessed_at ON renders(accessed_at)")
+
+    def get(self, key: str) -> CachedRender | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT kind, file_id, size FROM renders WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE renders SET accessed_at=? WHERE key=?", (int(time.time()), key))
+
+        data: bytes | None = None
+        if row["size"]:
+            try:
+                data = self._data_path(key).read_bytes()
+            except OSError:
+                data = None
+        if row["file_id"] is None and data is None:
+            self.delete(key)
+            return None
+        return CachedRender(kind=row["kind"], file_id=row["file_id"], data=data)
+
+    def put(self, key: str, *, kind: str, file_id: str | None, data: bytes | None) -> None:
+        size = 0
+        if data is not None and len(data) <= _MAX_STORED_BYTES:
+            path = self._data_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+            size = len(data)
+        else:
+            self._data_path(key).unlink(missing_ok=True)
+        if file_id is None and size == 0:
+            return
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO renders(key, kind, file_id, size, accessed_at) VALUES(?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    kind=excluded.kind, file_id=excluded.file_id, size=excluded.size, accessed_at=excluded.accessed_at
+                """,
+                (key, kind, file_id, size, int(time.time())),
+            )
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM renders WHERE key=?", (key,))
+        self._data_path(key).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT COALESCE(SUM(size), 0) AS total, COUNT(*) AS n FROM renders").fetchone()
+            total, count = int(row["total"]), int(row["n"])
+            if total <= self._max_bytes and count <= _MAX_ENTRIES:
+                return
+
+            evicted: list[str] = []
+            for old in conn.execute("SELECT key, size FROM renders ORDER BY accessed_at"):
+                if total <= self._max_bytes and count <= _MAX_ENTRIES:
+                    break
+                evicted.append(old["key"])
+                total -= int(old["size"])
+                count -= 1
+            conn.executemany("DELETE FROM renders WHERE key=?", [(k,) for k in evicted])
+
+        for key in evicted:
+            self._data_path(key).unlink(missing_ok=True)
+        logging.info("Render cache evicted %s entries", len(evicted))
+
+
+class RenderCache:
+    """LRU cache of renders keyed by source file_unique_id, caption, effect and renderer version.
+
+    A hit is answered by resending the stored file_id (or stored bytes), without
+    downloading or rendering anything.
+    """
+
+    def __init__(self, *, root: Path, max_bytes: int) -> None:
+        self._storage = RenderCacheStorage(root=root, max_bytes=max_bytes)
+
+    def init_db(self) -> None:
+        self._storage.init_db()
+
+    @staticmethod
+    def key(*, file_unique_id: str, caption: str, effect: str | None, variant: str = "demotivator") -> str:
+        raw = "\x00".join((str(RENDERER_VERSION), variant, file_unique_id, caption, effect or ""))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> CachedRender | None:
+        try:
+            return await run_in_thread(self._storage.get, key)
+        except Exception as e:
+            logging.error("Render cache read failed: %s", e, exc_info=True)
+            return None
+
+    async def put(self, key: str, *, kind: str, file_id: str | None = None, data: bytes | None = None) -> None:
+        try:
+            await run_in_thread(self._storage.put, key, kind=kind, file_id=file_id, data=data)
+        except Exception as e:
+            logging.error("Render cache write failed: %s", e, exc_info=True)
+
+    async def forget(self, key: str) -> None:
+        try:
+            await run_in_thread(self._storage.delete, key)
+        except Exception as e:
+            logging.error("Render cache delete failed: %s", e, exc_info=True)
@@ -0,0 +1,168 @@
+"""Process pool for CPU-bound image rendering (bytes in, bytes out)."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+import logging
+import multiprocessing
+from typing import TypeVar
+
+from demotivator.image_creator import create_demotivator_image_bytes
+from demotivator.layout import LayoutConfig
+from demotivator.trump_tweet import create_trump_tweet_image_bytes, preload_tweet_fonts
+from utils.asyncio_utils import run_in_thread
+from utils.emoji_cache import configure_emoji_source
+from utils.emoji_pack import split_image_bytes_to_grid
+from utils.fonts import preload_fonts
+from utils.tenet import mirror_image_bytes
+from utils.text import generate_text_image_bytes
+
+
+T = TypeVar("T")
+
+# Sizes hit by generate_text_image (120..50 step 10) and typical demotivator captions.
+_WARM_FONT_SIZES = (20, 40, 50, 55, 60, 65, 70, 80, 90, 100, 110, 120)
+
+
+def _init_worker(
+    layout_cfg: LayoutConfig,
+    emoji_cache_dir: str,
+    emoji_pack_dir: str | None,
+    emoji_online: bool,
+) -> None:
+    configure_emoji_source(
+        cache_dir=Path(emoji_cache_dir),
+        pack_dir=Path(emoji_pack_dir) if emoji_pack_dir else None,
+        online=emoji_online,
+    )
+    preload_fonts(
+        _WARM_FONT_SIZES,
+        font_paths=layout_cfg.font_paths,
+        unicode_font_paths=layout_cfg.unicode_font_paths,
+    )
+    preload_tweet_fonts()
+
+
+def _ping() -> bool:
+    return True
+
+
+class RenderService:
+    """Runs image render jobs in warm worker processes.
+
+    With workers=0 jobs run in the default thread pool, as before.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int,
+        layout_cfg: LayoutConfig,
+        emoji_cache_dir: Path,
+        emoji_pack_dir: Path | None = None,
+        emoji_online: bool = True,
+    ) -> None:
+        self._workers = max(0, workers)
+        self._layout_cfg = layout_cfg
+        self._initargs = (
+            layout_cfg,
+            str(emoji_cache_dir),
+            str(emoji_pack_dir) if emoji_pack_dir else None,
+            emoji_online,
+        )
+        self._pool: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        if self._workers == 0 or self._pool is not None:
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+        # Spawn all workers now so the first request does not pay for imports and font loading.
+        for _ in range(self._workers):
+            self._pool.submit(_ping)
+        logging.info("Render pool started with %s workers", self._workers)
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+            logging.info("Render pool stopped")
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Run a picklable module-level callable in the pool (or a thread without one)."""
+        pool = self._pool
+        if pool is None:
+            return await run_in_thread(func, *args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        job = partial(func, *args, **kwargs)
+        try:
+            return await loop.run_in_executor(pool, job)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a codec). The job may be the culprit, so it
+            # never runs in the bot process: it gets one more try in a fresh pool.
+            logging.error("Render pool is broken, restarting")
+            pool = self._restart(pool)
+            if pool is None:
+                raise RuntimeError("render pool is shut down")
+
+        try:
+            return await loop.run_in_executor(pool, job)
+        except BrokenProcessPool:
+            logging.error("Render job %s crashed the pool twice, giving up", getattr(func, "__name__", func))
+            self._restart(pool)
+            raise
+
+    def _restart(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor | None:
+        """Replace a broken pool (once, however many jobs noticed it); returns the current pool.
+
+        None if the service was shut down meanwhile.
+        """
+        if self._pool is broken:
+            self._pool = None
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.start()
+        return self._pool
+
+    async def demotivator_image(
+        self,
+        image: bytes,
+        *,
+        text: str,
+        is_avatar: bool = False,
+        effect: str | None = None,
+    ) -> bytes | None:
+        return await self.run(
+            create_demotivator_image_bytes,
+            image,
+            text=text,
+            layout_cfg=self._layout_cfg,
+            is_avatar=is_avatar,
+            effect=effect,
+        )
+
+    async def text_image(self, text: str) -> bytes | None:
+        return await self.run(
+            generate_text_image_bytes,
+            text,
+            font_paths=self._layout_cfg.font_paths,
+            unicode_font_paths=self._layout_cfg.unicode_font_paths,
+        )
+
+    async def trump_tweet(self, *, text: str, avatar: bytes | None) -> bytes | None:
+        return await self.run(create_trump_tweet_image_bytes, text=text, avatar=avatar)
+
+    async def split_image(self, image: bytes, *, cols: int, rows: int) -> list[bytes]:
+        return await self.run(split_image_bytes_to_grid, image, cols=cols, rows=rows)
+
+    async def mirror_image(self, image: bytes) -> bytes | None:
+        return await self.run(mirror_image_bytes, image)
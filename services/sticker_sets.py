@@ -0,0 +1,131 @@
+"""In-memory, background-refreshed cache of sticker set metadata."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+import logging
+import random
+import time
+
+from aiogram import Bot
+
+
+_DEFAULT_TTL_SECONDS = 6 * 60 * 60
+# A pack that failed to load is retried no sooner than this.
+_FAILED_RETRY_SECONDS = 10 * 60
+# Pause between packs during a background refresh, to stay far from flood limits.
+_REFRESH_STEP_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class StickerInfo:
+    file_id: str
+    file_unique_id: str
+    is_animated: bool
+    is_video: bool
+    thumbnail_file_id: str | None
+
+
+@dataclass(frozen=True)
+class _CachedSet:
+    stickers: tuple[StickerInfo, ...]
+    fetched_at: float
+    ok: bool
+
+
+class StickerSetCache:
+    """Sticker sets by name with a TTL; lookups after the first fetch are local.
+
+    Expired sets are still served while a refresh is in flight, and concurrent
+    requests for the same set share a single get_sticker_set call.
+    """
+
+    def __init__(self, *, ttl_seconds: float = _DEFAULT_TTL_SECONDS) -> None:
+        self._ttl = ttl_seconds
+        self._sets: dict[str, _CachedSet] = {}
+        self._inflight: dict[str, asyncio.Task[_CachedSet]] = {}
+
+    def _is_fresh(self, cached: _CachedSet) -> bool:
+        max_age = self._ttl if cached.ok else _FAILED_RETRY_SECONDS
+        return time.monotonic() - cached.fetched_at < max_age
+
+    async def _fetch(self, bot: Bot, name: str) -> _CachedSet:
+        try:
+            sset = await bot.get_sticker_set(name)
+            stickers = tuple(
+                StickerInfo(
+                    file_id=s.file_id,
+                    file_unique_id=s.file_unique_id,
+                    is_animated=bool(s.is_animated),
+                    is_video=bool(s.is_video),
+                    thumbnail_file_id=s.thumbnail.file_id if s.thumbnail else None,
+                )
+                for s in sset.stickers
+            )
+            cached = _CachedSet(stickers=stickers, fetched_at=time.monotonic(), ok=True)
+        except Exception as e:
+            logging.warning("Failed to load sticker set %s: %s", name, e)
+            previous = self._sets.get(name)
+            # Keep serving the last good copy if there is one.
+            stickers = previous.stickers if previous is not None else ()
+            cached = _CachedSet(stickers=stickers, fetched_at=time.monotonic(), ok=False)
+        self._sets[name] = cached
+        return cached
+
+    def _refresh(self, bot: Bot, name: str) -> asyncio.Task[_CachedSet]:
+        task = self._inflight.get(name)
+        if task is None:
+            task = asyncio.create_task(self._fetch(bot, name))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(name, None))
+        return task
+
+    async def get(self, bot: Bot, name: str) -> tuple[StickerInfo, ...]:
+        cached = self._sets.get(name)
+        if cached is not None:
+            if not self._is_fresh(cached):
+                self._refresh(bot, name)
+            return cached.stickers
+        return (await asyncio.shield(self._refresh(bot, name))).stickers
+
+    async def random_sticker(
+        self,
+        bot: Bot,
+        names: Iterable[str],
+        *,
+        predicate: Callable[[StickerInfo], bool] | None = None,
+    ) -> StickerInfo | None:
+        """Pick a random sticker from a random loaded set; fetches only if nothing is loaded yet."""
+        names = list(names)
+        loaded = [n for n in names if self._sets.get(n) is not None and self._sets[n].stickers]
+        random.shuffle(loaded)
+        for name in loaded:
+            candidates = [s for s in await self.get(bot, name) if predicate is None or predicate(s)]
+            if candidates:
+                return random.choice(candidates)
+
+        for name in random.sample(names, k=min(len(names), 6)):
+            candidates = [s for s in await self.get(bot, name) if predicate is None or predicate(s)]
+            if candidates:
+                return random.choice(candidates)
+        return None
+
+    async def refresh(self, bot: Bot, names: Iterable[str]) -> None:
+        """Load every set that is missing or expired, one at a time."""
+        for name in names:
+            cached = self._sets.get(name)
+            if cached is not None and self._is_fresh(cached):
+                continue
+            await self._refresh(bot, name)
+            await asyncio.sleep(_REFRESH_STEP_SECONDS)
+
+
+async def refresh_sticker_sets(cache: StickerSetCache, bot: Bot, names: tuple[str, ...], *, interval: float) -> None:
+    while True:
+        try:
+            await cache.refresh(bot, names)
+        except Exception:
+            logging.exception("Unexpected sticker set refresh failure")
+        await asyncio.sleep(interval)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Callable
-from typing import TypeVar
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+import time
+from typing import Generic, TypeVar
 
 
 T = TypeVar("T")
@@ -16,3 +18,58 @@ async def run_in_thread(func: Callable[..., T], *args, **kwargs) -> T:
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
     return await to_thread(func, *args, **kwargs)
+
+
+class SingleFlightCache(Generic[T]):
+    """Memoizes async computations by key.
+
+    Concurrent calls for the same key share one run of the factory; its result
+    is then served for `ttl_seconds`. The least recently used entries are
+    dropped beyond `max_entries`. Exceptions are not cached.
+    """
+
+    def __init__(self, *, ttl_seconds: float, max_entries: int) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task[T]] = {}
+
+    async def _compute(
+        self, key: Hashable, factory: Callable[[], Awaitable[T]], cache_if: Callable[[T], bool] | None
+    ) -> T:
+        value = await factory()
+        if cache_if is None or cache_if(value):
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _finished(self, key: Hashable, task: asyncio.Task[T]) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller has gone away.
+            task.exception()
+
+    async def get(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[T]],
+        *,
+        cache_if: Callable[[T], bool] | None = None,
+    ) -> T:
+        """Cached value for `key`, computing it with `factory` at most once at a time."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if time.monotonic() - entry[0] < self._ttl:
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, factory, cache_if))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        # One caller giving up (cancelled request) must not cancel the others.
+        return await asyncio.shield(task)
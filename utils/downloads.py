@@ -0,0 +1,74 @@
+"""Telegram file downloads with size limits checked before anything is fetched."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.types import File, PhotoSize
+
+
+# getFile refuses bigger files for bots, so there is no point in trying.
+TELEGRAM_MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+# In-memory downloads (images, stickers) are never larger than this.
+MEMORY_MAX_BYTES = 10 * 1024 * 1024
+# Longer side the image renderers work at; bigger photo sizes are only downscaled.
+RENDER_SIDE = 1024
+
+
+class DownloadTooLargeError(ValueError):
+    def __init__(self, size: int, limit: int) -> None:
+        super().__init__(f"file is {size} bytes, limit is {limit}")
+        self.size = size
+        self.limit = limit
+
+    @property
+    def limit_mb(self) -> int:
+        return self.limit // (1024 * 1024)
+
+
+def pick_photo_size(sizes: list[PhotoSize], *, min_side: int = RENDER_SIDE) -> PhotoSize:
+    """Smallest photo size whose longer side covers `min_side`; the largest one if none does."""
+    big_enough = [s for s in sizes if max(s.width, s.height) >= min_side]
+    if big_enough:
+        return min(big_enough, key=lambda s: s.width * s.height)
+    return max(sizes, key=lambda s: s.width * s.height)
+
+
+def _check_size(obj, limit: int) -> None:
+    size = getattr(obj, "file_size", None)
+    if size is not None and size > limit:
+        raise DownloadTooLargeError(size, limit)
+
+
+async def download_bytes(bot: Bot, obj, *, max_bytes: int = MEMORY_MAX_BYTES) -> bytes:
+    """Download a Telegram file (PhotoSize, Sticker, Document, File, file_id ...) into memory."""
+    _check_size(obj, max_bytes)
+    if isinstance(obj, File):
+        buf = await bot.download_file(obj.file_path)
+    else:
+        buf = await bot.download(obj)
+    data = buf.getvalue() if buf is not None else b""
+    # file_size is optional, so the limit is enforced again on what actually arrived.
+    if len(data) > max_bytes:
+        raise DownloadTooLargeError(len(data), max_bytes)
+    return data
+
+
+async def download_file(
+    bot: Bot, obj, destination: str | Path, *, max_bytes: int = TELEGRAM_MAX_DOWNLOAD_BYTES
+) -> None:
+    """Stream a Telegram file to disk (videos, audio, documents processed by ffmpeg).
+
+    Passing the `File` from an earlier `bot.get_file` call skips a second getFile request.
+    """
+    _check_size(obj, max_bytes)
+    if isinstance(obj, File):
+        await bot.download_file(obj.file_path, destination=destination)
+    else:
+        await bot.download(obj, destination=destination)
+    size = os.path.getsize(destination)
+    if size > max_bytes:
+        Path(destination).unlink(missing_ok=True)
+        raise DownloadTooLargeError(size, max_bytes)
@@ -0,0 +1,182 @@
+"""Local emoji glyph cache used as the Pilmoji image source."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import quote_plus
+from urllib.request import Request, urlopen
+import logging
+import os
+import shutil
+import threading
+import time
+
+from pilmoji.source import BaseSource
+
+
+_CDN_URL = "https://emojicdn.elk.sh/{emoji}?style=twitter"
+_USER_AGENT = "Mozilla/5.0"
+# After a timeout or connection error the CDN is not asked for that glyph again for a while.
+_RETRY_AFTER_SECONDS = 60.0
+
+
+def emoji_filename(emoji: str) -> str:
+    """Twemoji-style file name: lowercase hex codepoints joined with '-'."""
+    return "-".join(f"{ord(ch):x}" for ch in emoji) + ".png"
+
+
+def _filename_candidates(emoji: str) -> tuple[str, ...]:
+    # Twemoji drops the FE0F variation selector from most (non-ZWJ) file names.
+    name = emoji_filename(emoji)
+    stripped = emoji.replace("\ufe0f", "")
+    if stripped and stripped != emoji:
+        return name, emoji_filename(stripped)
+    return (name,)
+
+
+class CachedEmojiSource(BaseSource):
+    """Pilmoji source backed by an in-memory LRU and an on-disk glyph directory.
+
+    Lookup order: memory -> cache dir -> bundled pack dir -> CDN (only if online).
+    Definitive misses (the CDN answers 404, or offline and not on disk) are
+    remembered for good; after a transient fetch error the glyph is retried a
+    minute later.
+    """
+
+    def __init__(
+        self,
+        *,
+        cache_dir: Path,
+        pack_dir: Path | None = None,
+        online: bool = True,
+        fetch_timeout: float = 3.0,
+        max_memory_items: int = 512,
+    ) -> None:
+        self._cache_dir = cache_dir
+        self._pack_dir = pack_dir
+        self._online = online
+        self._fetch_timeout = fetch_timeout
+        self._max_memory_items = max_memory_items
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._missing: set[str] = set()
+        self._retry_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get_emoji(self, emoji: str, /) -> BytesIO | None:
+        data = self.get_bytes(emoji)
+        # Pilmoji closes the streams it was given, so always hand out a fresh one.
+        return BytesIO(data) if data is not None else None
+
+    def get_discord_emoji(self, id: int, /) -> BytesIO | None:
+        return None
+
+    def get_bytes(self, emoji: str) -> bytes | None:
+        with self._lock:
+            data = self._memory.get(emoji)
+            if data is not None:
+                self._memory.move_to_end(emoji)
+                return data
+            if emoji in self._missing or time.monotonic() < self._retry_at.get(emoji, 0.0):
+                return None
+
+        data = self._load_local(emoji)
+        final = True
+        if data is None and self._online:
+            data, final = self._fetch(emoji)
+            if data is not None:
+                self._store_disk(emoji, data)
+
+        with self._lock:
+            if data is None:
+                if final:
+                    self._missing.add(emoji)
+                else:
+                    self._retry_at[emoji] = time.monotonic() + _RETRY_AFTER_SECONDS
+                return None
+            self._retry_at.pop(emoji, None)
+            self._memory[emoji] = data
+            self._memory.move_to_end(emoji)
+            while len(self._memory) > self._max_memory_items:
+                self._memory.popitem(last=False)
+        return data
+
+    def _load_local(self, emoji: str) -> bytes | None:
+        dirs = [self._cache_dir]
+        if self._pack_dir is not None:
+            dirs.append(self._pack_dir)
+        for directory in dirs:
+            for name in _filename_candidates(emoji):
+                path = directory / name
+                try:
+                    return path.read_bytes()
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    logging.warning("Failed to read emoji glyph %s: %s", path, e)
+        return None
+
+    def _fetch(self, emoji: str) -> tuple[bytes | None, bool]:
+        """Glyph bytes, and whether a miss is final (the CDN has no such glyph)."""
+        url = _CDN_URL.format(emoji=quote_plus(emoji))
+        try:
+            with urlopen(Request(url, headers={"User-Agent": _USER_AGENT}), timeout=self._fetch_timeout) as resp:
+                data = resp.read()
+        except HTTPError as e:
+            logging.warning("Emoji fetch failed for %r: %s", emoji, e)
+            return None, e.code == 404
+        except Exception as e:
+            logging.warning("Emoji fetch failed for %r: %s", emoji, e)
+            return None, False
+        return data or None, not data
+
+    def _store_disk(self, emoji: str, data: bytes) -> None:
+        path = self._cache_dir / emoji_filename(emoji)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning("Failed to store emoji glyph %s: %s", path, e)
+
+
+def prepopulate_from_pack(*, pack_dir: Path, cache_dir: Path) -> int:
+    """Copy PNG glyphs from a bundled pack (e.g. Twemoji 72x72) into the cache dir."""
+    if not pack_dir.is_dir():
+        return 0
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    copied = 0
+    for src in pack_dir.glob("*.png"):
+        dst = cache_dir / src.name.lower()
+        if dst.exists():
+            continue
+        shutil.copyfile(src, dst)
+        copied += 1
+    if copied:
+        logging.info("Prepopulated %s emoji glyphs from %s", copied, pack_dir)
+    return copied
+
+
+_source: CachedEmojiSource | None = None
+
+
+def configure_emoji_source(
+    *,
+    cache_dir: Path,
+    pack_dir: Path | None = None,
+    online: bool = True,
+) -> CachedEmojiSource:
+    global _source
+    _source = CachedEmojiSource(cache_dir=cache_dir, pack_dir=pack_dir, online=online)
+    return _source
+
+
+def emoji_source() -> CachedEmojiSource:
+    """Shared source for all Pilmoji renders (lazily created with default dirs)."""
+    global _source
+    if _source is None:
+        _source = CachedEmojiSource(cache_dir=Path("cache") / "emoji")
+    return _source
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 import logging
 import os
-import subprocess
 import time
 
 from aiogram import Bot
 from PIL import Image
 
+from utils.ffmpeg import probe_media, run_ffmpeg
+
 
 def calculate_grid_size(width: int, height: int, user_grid: str | None = None) -> tuple[int, int]:
     """Pick a grid size based on aspect ratio or user-specified "<cols>x<rows>"."""
@@ -42,29 +45,35 @@ def calculate_grid_size(width: int, height: int, user_grid: str | None = None) -
     return grid
 
 
-def split_image_to_grid(*, image_path: str, cols: int, rows: int, output_dir: str) -> list[str]:
-    """Split an image into a grid and save WEBP parts (100x100)."""
-    try:
-        img = Image.open(image_path).convert("RGBA")
-        width, height = img.size
+_TILE_SIZE = 100
+_TILE_ENCODE_THREADS = 4
+
+
+def _grid_cells(img: Image.Image, *, cols: int, rows: int) -> list[Image.Image]:
+    # One resample of the whole image to the grid size, then cheap tile crops.
+    grid = img.resize((cols * _TILE_SIZE, rows * _TILE_SIZE), Image.Resampling.LANCZOS)
+    return [
+        grid.crop((col * _TILE_SIZE, row * _TILE_SIZE, (col + 1) * _TILE_SIZE, (row + 1) * _TILE_SIZE))
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
 
-        cell_width = width // cols
-        cell_height = height // rows
+def _encode_webp(cell: Image.Image) -> bytes:
+    buf = BytesIO()
+    cell.save(buf, "WEBP", quality=95)
+    return buf.getvalue()
 
-        parts: list[str] = []
-        for row in range(rows):
-            for col in range(cols):
-                left = col * cell_width
-                top = row * cell_height
-                right = left + cell_width
-                bottom = top + cell_height
 
-                cell = img.crop((left, top, right, bottom))
-                cell = cell.resize((100, 100), Image.Resampling.LANCZOS)
+def split_image_bytes_to_grid(image: bytes, *, cols: int, rows: int) -> list[bytes]:
+    """Split an image into 100x100 WEBP tiles (row-major), encoded in parallel."""
+    try:
+        img = Image.open(BytesIO(image)).convert("RGBA")
+        cells = _grid_cells(img, cols=cols, rows=rows)
 
-                part_path = f"{output_dir}/part_{row}_{col}.webp"
-                cell.save(part_path, "WEBP", quality=95)
-                parts.append(part_path)
+        # libwebp releases the GIL, so threads encode tiles concurrently.
+        with ThreadPoolExecutor(max_workers=min(_TILE_ENCODE_THREADS, len(cells))) as pool:
+            parts = list(pool.map(_encode_webp, cells))
 
         logging.info("Split image into %s parts (%sx%s)", len(parts), cols, rows)
         return parts
@@ -73,86 +82,124 @@ def split_image_to_grid(*, image_path: str, cols: int, rows: int, output_dir: st
         return []
 
 
-def _probe_video_dims(video_path: str) -> tuple[int, int] | None:
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-select_streams",
-        "v:0",
-        "-show_entries",
-        "stream=width,height",
-        "-of",
-        "csv=p=0",
-        video_path,
+async def probe_video_dims(video_path: str) -> tuple[int, int] | None:
+    info = await probe_media(video_path)
+    return (info.width, info.height) if info is not None else None
+
+
+_VIDEO_EMOJI_MAX_BYTES = 256 * 1024
+_VIDEO_EMOJI_BITRATE_KBPS = 150
+_VIDEO_EMOJI_MIN_BITRATE_KBPS = 40
+
+
+def _tile_filter_graph(*, cols: int, rows: int, tiles: list[tuple[int, int]]) -> str:
+    """Decode once, scale the frame to the emoji grid, split it and crop each tile."""
+    count = len(tiles)
+    graph = [
+        f"[0:v]fps=30,scale={cols * 100}:{rows * 100},setsar=1,format=yuva420p,"
+        f"split={count}" + "".join(f"[s{i}]" for i in range(count))
+    ]
+    for i, (row, col) in enumerate(tiles):
+        graph.append(f"[s{i}]crop=100:100:{col * 100}:{row * 100}[t{i}]")
+    return ";".join(graph)
+
+
+def _tile_output_args(*, index: int, bitrate_kbps: int, output_path: str) -> list[str]:
+    return [
+        "-map",
+        f"[t{index}]",
+        "-t",
+        "3",
+        "-c:v",
+        "libvpx-vp9",
+        "-b:v",
+        f"{bitrate_kbps}k",
+        "-maxrate",
+        f"{bitrate_kbps}k",
+        "-bufsize",
+        f"{bitrate_kbps * 2}k",
+        "-an",
+        "-pix_fmt",
+        "yuva420p",
+        "-auto-alt-ref",
+        "0",
+        output_path,
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-    if result.returncode != 0:
-        logging.error("ffprobe failed: %s", result.stderr)
-        return None
-    try:
-        width, height = map(int, result.stdout.strip().split(","))
-        return width, height
-    except Exception:
-        logging.error("Failed to parse video dimensions: %r", result.stdout)
-        return None
 
 
-def split_video_to_grid(*, video_path: str, cols: int, rows: int, output_dir: str) -> list[str]:
-    """Split a video into WEBM parts (VP9) using ffmpeg crop+scale."""
-    try:
-        dims = _probe_video_dims(video_path)
-        if dims is None:
-            return []
-        width, height = dims
-        logging.info("Video dimensions: %sx%s", width, height)
-
-        cell_width = width // cols
-        cell_height = height // rows
-
-        parts: list[str] = []
-        for row in range(rows):
-            for col in range(cols):
-                x = col * cell_width
-                y = row * cell_height
-                output_path = f"{output_dir}/part_{row}_{col}.webm"
+async def _encode_tiles(
+    *,
+    video_path: str,
+    cols: int,
+    rows: int,
+    tiles: list[tuple[int, int]],
+    bitrates: dict[tuple[int, int], int],
+    output_dir: str,
+    timeout_seconds: float,
+) -> bool:
+    args = ["-t", "3", "-i", video_path, "-filter_complex", _tile_filter_graph(cols=cols, rows=rows, tiles=tiles)]
+    for i, (row, col) in enumerate(tiles):
+        args += _tile_output_args(
+            index=i, bitrate_kbps=bitrates[(row, col)], output_path=f"{output_dir}/part_{row}_{col}.webm"
+        )
+    result = await run_ffmpeg(args, timeout=timeout_seconds, label=f"ffmpeg emoji tiles x{len(tiles)}")
+    if result.timed_out:
+        logging.error("Video splitting timeout")
+    return result.ok
 
-                cmd = [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    video_path,
-                    "-t",
-                    "3",
-                    "-vf",
-                    f"crop={cell_width}:{cell_height}:{x}:{y},scale=100:100",
-                    "-c:v",
-                    "libvpx-vp9",
-                    "-b:v",
-                    "150k",
-                    "-an",
-                    "-pix_fmt",
-                    "yuva420p",
-                    "-auto-alt-ref",
-                    "0",
-                    output_path,
-                ]
-
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60, check=False)
-                if result.returncode == 0 and os.path.exists(output_path):
-                    file_size = os.path.getsize(output_path)
-                    if file_size > 256 * 1024:
-                        logging.warning("Part %s,%s is too large: %s bytes", row, col, file_size)
-                    parts.append(output_path)
-                else:
-                    logging.error("Failed to create video part %s,%s: %s", row, col, result.stderr)
 
+async def split_video_to_grid(
+    *, video_path: str, cols: int, rows: int, output_dir: str, timeout_seconds: float = 120
+) -> list[bytes]:
+    """Split a video into WEBM tiles (VP9, 100x100, row-major) with a single decode.
+
+    One ffmpeg process produces every tile through a split/crop filter graph.
+    Tiles over the 256 KB custom emoji limit are re-encoded at a lower bitrate
+    (only those tiles, again in one process).
+    """
+    try:
+        tiles = [(row, col) for row in range(rows) for col in range(cols)]
+        bitrates = {tile: _VIDEO_EMOJI_BITRATE_KBPS for tile in tiles}
+
+        pending = tiles
+        for attempt in range(3):
+            if not await _encode_tiles(
+                video_path=video_path,
+                cols=cols,
+                rows=rows,
+                tiles=pending,
+                bitrates=bitrates,
+                output_dir=output_dir,
+                timeout_seconds=timeout_seconds,
+            ):
+                return []
+
+            oversized: list[tuple[int, int]] = []
+            for row, col in pending:
+                output_path = f"{output_dir}/part_{row}_{col}.webm"
+                if not os.path.exists(output_path):
+                    logging.error("Failed to create video part %s,%s", row, col)
+                    return []
+                file_size = os.path.getsize(output_path)
+                if file_size > _VIDEO_EMOJI_MAX_BYTES:
+                    logging.warning("Part %s,%s is too large: %s bytes (attempt %s)", row, col, file_size, attempt + 1)
+                    scaled = int(bitrates[(row, col)] * _VIDEO_EMOJI_MAX_BYTES / file_size * 0.85)
+                    bitrates[(row, col)] = max(_VIDEO_EMOJI_MIN_BITRATE_KBPS, scaled)
+                    oversized.append((row, col))
+
+            if not oversized:
+                break
+            pending = oversized
+        else:
+            logging.error("Parts still over the size limit after re-encoding: %s", pending)
+
+        parts: list[bytes] = []
+        for row, col in tiles:
+            with open(f"{output_dir}/part_{row}_{col}.webm", "rb") as f:
+                parts.append(f.read())
         logging.info("Split video into %s parts (%sx%s)", len(parts), cols, rows)
         return parts
 
-    except subprocess.TimeoutExpired:
-        logging.error("Video splitting timeout")
-        return []
     except Exception as e:
         logging.error("Error splitting video: %s", e, exc_info=True)
         return []
@@ -162,10 +209,10 @@ async def create_custom_emoji_pack(
     *,
     bot: Bot,
     user_id: int,
-    parts: list[str],
+    parts: list[bytes],
     is_video: bool = False,
 ) -> str:
-    """Create a custom-emoji sticker set from parts and return pack name."""
+    """Create a custom-emoji sticker set from encoded parts and return pack name."""
     from aiogram.types import BufferedInputFile, InputSticker
 
     timestamp = int(time.time())
@@ -201,9 +248,7 @@ async def create_custom_emoji_pack(
         "🔸",
     ]
 
-    for i, part_path in enumerate(parts):
-        with open(part_path, "rb") as f:
-            file_data = f.read()
+    for i, file_data in enumerate(parts):
         filename = f"part_{i}.webm" if is_video else f"part_{i}.webp"
         stickers.append(
             InputSticker(
@@ -7,8 +7,10 @@ import random
 
 from aiogram import Bot
 
+from services.sticker_sets import StickerInfo, StickerSetCache
 
-_STICKER_PACKS: tuple[str, ...] = (
+
+FALLBACK_STICKER_PACKS: tuple[str, ...] = (
     "sp031fedcbc4e438a8984a76e28c81713d_by_stckrRobot",
     "sp70cc950ed11089c18703860f5419aa27_by_stckrRobot",
     "sp5e6aec1cfbfc458c3166a9bbb80e4bf2_by_stckrRobot",
@@ -87,50 +89,49 @@ _STICKER_PACKS: tuple[str, ...] = (
 )
 
 
+def usable_fallback_sticker(sticker: StickerInfo) -> bool:
+    # TGS stickers are only usable through their thumbnail preview.
+    return not sticker.is_animated or sticker.thumbnail_file_id is not None
+
+
 async def get_random_fallback_image(
     bot: Bot,
     *,
-    message_id: int,
+    directory: Path,
     fallback_avatar: Path,
+    sticker_sets: StickerSetCache,
     prefer_local_probability: float = 0.02,
-    max_attempts: int = 6,
+    max_attempts: int = 3,
 ) -> str | None:
-    """Download a random sticker (or use a local placeholder) and return a temp file path."""
+    """Download a random sticker (or use a local placeholder) into `directory` and return its path.
+
+    The sticker is picked from cached set metadata, so only the chosen file is downloaded.
+    """
     # With small probability prefer a local placeholder (if present).
     if random.random() < prefer_local_probability and fallback_avatar.exists():
-        output_file = f"temp_fallback_{message_id}.png"
+        output_file = str(directory / "fallback.png")
         copy2(fallback_avatar, output_file)
         logging.info("Using local fallback avatar: %s", fallback_avatar)
         return output_file
 
     for _ in range(max_attempts):
-        pack_name = random.choice(_STICKER_PACKS)
-        try:
-            logging.info("Getting random sticker from pack: %s", pack_name)
-            sticker_set = await bot.get_sticker_set(pack_name)
-            if not sticker_set.stickers:
-                continue
-
-            sticker = random.choice(sticker_set.stickers)
-            logging.info(
-                "Selected sticker: animated=%s, video=%s", sticker.is_animated, sticker.is_video
-            )
+        sticker = await sticker_sets.random_sticker(
+            bot, FALLBACK_STICKER_PACKS, predicate=usable_fallback_sticker
+        )
+        if sticker is None:
+            break
+        logging.info("Selected sticker: animated=%s, video=%s", sticker.is_animated, sticker.is_video)
 
+        try:
             if sticker.is_animated:
-                # TGS stickers: use thumbnail preview when available.
-                if sticker.thumbnail:
-                    output_file = f"temp_fallback_{message_id}.jpg"
-                    await bot.download(sticker.thumbnail, destination=output_file)
-                    return output_file
-                continue
-
-            if sticker.is_video:
-                output_file = f"temp_fallback_{message_id}.webm"
-                await bot.download(sticker, destination=output_file)
-                return output_file
-
-            output_file = f"temp_fallback_{message_id}.webp"
-            await bot.download(sticker, destination=output_file)
+                output_file = str(directory / "fallback.jpg")
+                await bot.download(sticker.thumbnail_file_id, destination=output_file)
+            elif sticker.is_video:
+                output_file = str(directory / "fallback.webm")
+                await bot.download(sticker.file_id, destination=output_file)
+            else:
+                output_file = str(directory / "fallback.webp")
+                await bot.download(sticker.file_id, destination=output_file)
             return output_file
 
         except Exception as e:
@@ -138,9 +139,8 @@ async def get_random_fallback_image(
             continue
 
     if fallback_avatar.exists():
-        output_file = f"temp_fallback_{message_id}.png"
+        output_file = str(directory / "fallback.png")
         copy2(fallback_avatar, output_file)
         return output_file
 
     return None
-
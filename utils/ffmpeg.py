@@ -0,0 +1,326 @@
+"""Async ffmpeg/ffprobe runner with timeouts, cancellation and per-job accounting."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterable, Sequence
+from dataclasses import dataclass
+import json
+import logging
+import os
+import re
+import time
+
+
+_STDERR_TAIL_LINES = 40
+_SAMPLE_INTERVAL_SECONDS = 0.25
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+_active_jobs = 0
+
+
+def active_jobs() -> int:
+    """Number of ffmpeg/ffprobe processes started by this bot that are still running."""
+    return _active_jobs
+
+
+@dataclass(frozen=True)
+class ProcessResult:
+    returncode: int
+    stdout: bytes
+    stderr_tail: str
+    timed_out: bool
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_kb: int
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+@dataclass
+class _Usage:
+    cpu_seconds: float = 0.0
+    peak_rss_kb: int = 0
+
+
+def _sample_proc(pid: int, usage: _Usage) -> None:
+    # Linux only; silently does nothing elsewhere or once the process is gone.
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            fields = f.read().rsplit(b")", 1)[1].split()
+        usage.cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLK_TCK
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    usage.peak_rss_kb = max(usage.peak_rss_kb, int(line.split()[1]))
+                    break
+    except (OSError, IndexError, ValueError):
+        pass
+
+
+async def _sample_loop(pid: int, usage: _Usage) -> None:
+    while True:
+        _sample_proc(pid, usage)
+        await asyncio.sleep(_SAMPLE_INTERVAL_SECONDS)
+
+
+async def _read_stderr(stream: asyncio.StreamReader, tail: deque[str]) -> None:
+    # Progress lines end with '\r', so split on both line endings ourselves.
+    pending = b""
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            if pending.strip():
+                tail.append(pending.decode(errors="ignore"))
+            return
+        *lines, pending = re.split(rb"[\r\n]", pending + chunk)
+        for line in lines:
+            if line.strip():
+                tail.append(line.decode(errors="ignore"))
+
+
+async def _feed_stdin(stream: asyncio.StreamWriter, data: bytes | AsyncIterable[bytes]) -> None:
+    try:
+        if isinstance(data, bytes):
+            stream.write(data)
+            await stream.drain()
+        else:
+            async for chunk in data:
+                stream.write(chunk)
+                await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    except Exception:
+        logging.error("Failed to produce process input", exc_info=True)
+        raise
+    finally:
+        stream.close()
+
+
+async def run_process(
+    cmd: Sequence[str],
+    *,
+    timeout: float,
+    input: bytes | AsyncIterable[bytes] | None = None,
+    capture_stdout: bool = False,
+    label: str = "",
+) -> ProcessResult:
+    """Run a media subprocess without blocking the event loop.
+
+    `input` is written to stdin, either at once or chunk by chunk as an async
+    iterable yields it (e.g. raw frames while they are being rendered).
+
+    The process is killed on timeout and when the awaiting task is cancelled
+    (e.g. the request was aborted), so no orphan encoders are left behind.
+    """
+    global _active_jobs
+
+    name = label or os.path.basename(cmd[0])
+    start = time.monotonic()
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE if capture_stdout else asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _active_jobs += 1
+
+    tail: deque[str] = deque(maxlen=_STDERR_TAIL_LINES)
+    usage = _Usage()
+    sampler = asyncio.create_task(_sample_loop(proc.pid, usage))
+    tasks = [asyncio.create_task(_read_stderr(proc.stderr, tail))]
+    stdout_task = asyncio.create_task(proc.stdout.read()) if capture_stdout else None
+    if stdout_task is not None:
+        tasks.append(stdout_task)
+    if input is not None:
+        feeder = asyncio.create_task(_feed_stdin(proc.stdin, input))
+        # If producing the input fails, stop the process so the job reports failure.
+        feeder.add_done_callback(lambda t: None if t.cancelled() or t.exception() is None else _kill(proc))
+        tasks.append(feeder)
+
+    timed_out = False
+    try:
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            _kill(proc)
+            await proc.wait()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    except asyncio.CancelledError:
+        _kill(proc)
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        _active_jobs -= 1
+        sampler.cancel()
+
+    result = ProcessResult(
+        returncode=proc.returncode if proc.returncode is not None else -1,
+        stdout=stdout_task.result() if stdout_task is not None and not stdout_task.cancelled() else b"",
+        stderr_tail="\n".join(tail),
+        timed_out=timed_out,
+        wall_seconds=time.monotonic() - start,
+        cpu_seconds=usage.cpu_seconds,
+        peak_rss_kb=usage.peak_rss_kb,
+    )
+    logging.info(
+        "%s finished: rc=%s timed_out=%s wall=%.2fs cpu=%.2fs peak_rss=%sKB",
+        name,
+        result.returncode,
+        result.timed_out,
+        result.wall_seconds,
+        result.cpu_seconds,
+        result.peak_rss_kb,
+    )
+    if not result.ok:
+        logging.error("%s failed:\n%s", name, result.stderr_tail)
+    return result
+
+
+def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_ffmpeg(
+    args: Sequence[str],
+    *,
+    timeout: float,
+    input: bytes | AsyncIterable[bytes] | None = None,
+    capture_stdout: bool = False,
+    label: str = "ffmpeg",
+) -> ProcessResult:
+    """Run `ffmpeg -hide_banner -nostats -y <args>`."""
+    return await run_process(
+        ["ffmpeg", "-hide_banner", "-nostats", "-y", *args],
+        timeout=timeout,
+        input=input,
+        capture_stdout=capture_stdout,
+        label=label,
+    )
+
+
+async def run_ffprobe(args: Sequence[str], *, timeout: float = 15, label: str = "ffprobe") -> ProcessResult:
+    """Run `ffprobe -v error <args>` and capture stdout."""
+    return await run_process(
+        ["ffprobe", "-v", "error", *args],
+        timeout=timeout,
+        capture_stdout=True,
+        label=label,
+    )
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    width: int
+    height: int
+    duration: float
+    has_audio: bool
+    fps: float = 0.0
+
+
+async def probe_media(path: str, *, timeout: float = 15) -> MediaInfo | None:
+    """One ffprobe call for display size (rotation applied), duration and audio presence."""
+    result = await run_ffprobe(
+        [
+            "-show_entries",
+            "stream=codec_type,width,height,avg_frame_rate:stream_tags=rotate:stream_side_data=rotation:format=duration",
+            "-of",
+            "json",
+            path,
+        ],
+        timeout=timeout,
+    )
+    if not result.ok:
+        return None
+    try:
+        data = json.loads(result.stdout or b"{}")
+    except ValueError:
+        logging.error("Failed to parse ffprobe output: %r", result.stdout[:200])
+        return None
+
+    streams = data.get("streams") or []
+    video = next((s for s in streams if s.get("codec_type") == "video" and s.get("width")), None)
+    if video is None:
+        return None
+
+    width, height = int(video["width"]), int(video["height"])
+    rotation = video.get("tags", {}).get("rotate")
+    for side_data in video.get("side_data_list") or []:
+        rotation = side_data.get("rotation", rotation)
+    try:
+        if int(float(rotation or 0)) % 180:
+            # ffmpeg autorotates on decode, so the frames we get are transposed.
+            width, height = height, width
+    except ValueError:
+        pass
+
+    try:
+        duration = float((data.get("format") or {}).get("duration") or 0)
+    except ValueError:
+        duration = 0.0
+
+    return MediaInfo(
+        width=width,
+        height=height,
+        duration=duration,
+        has_audio=any(s.get("codec_type") == "audio" for s in streams),
+        fps=_parse_rate(video.get("avg_frame_rate")),
+    )
+
+
+def _parse_rate(rate: str | None) -> float:
+    # ffprobe reports rates as "30000/1001"; "0/0" means unknown.
+    try:
+        num, _, den = (rate or "").partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+async def keyframe_times(path: str, *, until: float, timeout: float = 30) -> list[float]:
+    """Keyframe timestamps of the first video stream up to `until`, relative to its first packet.
+
+    Reads packet headers only (nothing is decoded), so this is cheap even for long inputs.
+    """
+    result = await run_ffprobe(
+        [
+            "-select_streams",
+            "v:0",
+            "-read_intervals",
+            f"%+{until:.3f}",
+            "-show_entries",
+            "packet=pts_time,flags",
+            "-of",
+            "csv=p=0",
+            path,
+        ],
+        timeout=timeout,
+        label="ffprobe keyframes",
+    )
+    if not result.ok:
+        return []
+
+    first: float | None = None
+    times = []
+    for line in result.stdout.decode(errors="ignore").splitlines():
+        pts, _, flags = line.partition(",")
+        try:
+            t = float(pts)
+        except ValueError:
+            continue
+        first = t if first is None else min(first, t)
+        if "K" in flags:
+            times.append(t)
+    if first is None:
+        return []
+    # Input seeking (-ss before -i) is relative to the stream start.
+    return sorted(t - first for t in times)
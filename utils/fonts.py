@@ -1,16 +1,23 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
 import os
 
 from PIL import ImageFont
 
 
+@lru_cache(maxsize=256)
+def _truetype(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    # FreeType fonts are immutable once loaded, so one instance per (path, size) is shared.
+    return ImageFont.truetype(font_path, size)
+
+
 def get_font(size: int, *, font_paths: Sequence[str]) -> ImageFont.ImageFont:
     for font_path in font_paths:
         if os.path.exists(font_path):
             try:
-                return ImageFont.truetype(font_path, size)
+                return _truetype(font_path, size)
             except Exception:
                 continue
     return ImageFont.load_default()
@@ -22,8 +29,17 @@ def get_unicode_font(
     for font_path in unicode_font_paths:
         if os.path.exists(font_path):
             try:
-                return ImageFont.truetype(font_path, size)
+                return _truetype(font_path, size)
             except Exception:
                 continue
     return get_font(size, font_paths=font_paths)
 
+
+def preload_fonts(
+    sizes: Iterable[int], *, font_paths: Sequence[str], unicode_font_paths: Sequence[str]
+) -> None:
+    """Warm the font cache (used by render workers at startup)."""
+    for size in sizes:
+        get_font(size, font_paths=font_paths)
+        get_unicode_font(size, unicode_font_paths=unicode_font_paths, font_paths=font_paths)
+
@@ -1,47 +1,123 @@
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
 import logging
 import os
-import subprocess
 
+from utils.asyncio_utils import run_in_thread
+from utils.ffmpeg import run_ffmpeg
 
-def convert_tgs_to_mp4_simple(*, tgs_path: str, output_mp4: str) -> bool:
-    """Convert a TGS sticker to a short MP4 using lottie (cairo) + ffmpeg."""
+
+TGS_FPS = 30
+TGS_MAX_FRAMES = 90
+TGS_FRAME_SIZE = 512
+_FRAMES_PER_CHUNK = 15
+
+ChunkRunner = Callable[..., Awaitable[bytes]]
+
+
+def _load_tgs(tgs_path: str):
+    import gzip
+    import json
+
+    from lottie import parsers
+
+    with gzip.open(tgs_path, "rb") as f:
+        return parsers.tgs.parse_tgs(json.load(f))
+
+
+def tgs_frame_count(tgs_path: str, *, fps: int = TGS_FPS) -> int:
+    """Number of frames to render for up to 3 seconds of the sticker."""
+    anim = _load_tgs(tgs_path)
+    duration = anim.out_point / anim.frame_rate
+    return min(int(duration * fps), TGS_MAX_FRAMES)
+
+
+def render_tgs_chunk(tgs_path: str, *, start: int, count: int, fps: int, size: int) -> bytes:
+    """Render frames [start, start+count) as raw premultiplied BGRA (cairo ARGB32) bytes.
+
+    Top-level and picklable so chunks can be rendered in the process pool.
+    """
+    from io import BytesIO
+
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PNGSurface
+    from lottie.exporters.svg import export_svg
+
+    anim = _load_tgs(tgs_path)
+    frames: list[bytes] = []
+    for i in range(start, start + count):
+        svg = BytesIO()
+        export_svg(anim, svg, (i / fps) * anim.frame_rate, pretty=False)
+        # output=None renders into an in-memory ARGB32 surface without PNG encoding.
+        surface = PNGSurface(Tree(bytestring=svg.getvalue()), None, 96, output_width=size, output_height=size)
+        surface.cairo.flush()
+        frames.append(bytes(surface.cairo.get_data()))
+        surface.finish()
+    return b"".join(frames)
+
+
+async def _stream_chunks(
+    *, tgs_path: str, frame_count: int, fps: int, size: int, run_chunk: ChunkRunner
+) -> AsyncIterator[bytes]:
+    # All chunks are submitted up front (the runner bounds parallelism) and yielded in order.
+    tasks = [
+        asyncio.ensure_future(
+            run_chunk(
+                render_tgs_chunk,
+                tgs_path,
+                start=start,
+                count=min(_FRAMES_PER_CHUNK, frame_count - start),
+                fps=fps,
+                size=size,
+            )
+        )
+        for start in range(0, frame_count, _FRAMES_PER_CHUNK)
+    ]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def convert_tgs_to_mp4_simple(
+    *,
+    tgs_path: str,
+    output_mp4: str,
+    timeout_seconds: float = 60,
+    size: int = TGS_FRAME_SIZE,
+    run_chunk: ChunkRunner = run_in_thread,
+) -> bool:
+    """Convert a TGS sticker to a short MP4 by piping raw frames into ffmpeg.
+
+    Frames are rendered in chunks through `run_chunk` (a thread by default, or
+    the render process pool) and streamed to ffmpeg's stdin as rawvideo, so no
+    per-frame PNG files are written or decoded. `size` is the output side in px.
+    """
     logging.info("TGS conversion started: %s -> %s", tgs_path, output_mp4)
 
     try:
-        import gzip
-        import json
-        import shutil
-        import tempfile
-
-        from lottie import parsers
-        from lottie.exporters.cairo import export_png
-
-        with gzip.open(tgs_path, "rb") as f:
-            data = json.load(f)
-            anim = parsers.tgs.parse_tgs(data)
-
-        temp_dir = tempfile.mkdtemp(prefix="tgs_frames_")
-        try:
-            fps = 30
-            duration = anim.out_point / anim.frame_rate
-            frame_count = int(duration * fps)
-            logging.info("Rendering frames: %s (fps=%s, duration=%.2fs)", frame_count, fps, duration)
-
-            # Render up to 3 seconds (90 frames at 30 fps).
-            for i in range(min(frame_count, 90)):
-                t = (i / fps) * anim.frame_rate
-                frame_path = f"{temp_dir}/{i:04d}.png"
-                export_png(anim, frame_path, t, 512, 512)
-
-            cmd = [
-                "ffmpeg",
-                "-y",
+        fps = TGS_FPS
+        frame_count = await run_in_thread(tgs_frame_count, tgs_path, fps=fps)
+        if frame_count == 0:
+            return False
+        logging.info("Rendering frames: %s (fps=%s, size=%s)", frame_count, fps, size)
+
+        result = await run_ffmpeg(
+            [
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "bgra",
+                "-s",
+                f"{size}x{size}",
                 "-framerate",
                 str(fps),
                 "-i",
-                f"{temp_dir}/%04d.png",
+                "pipe:0",
                 "-c:v",
                 "libx264",
                 "-pix_fmt",
@@ -51,17 +127,17 @@ def convert_tgs_to_mp4_simple(*, tgs_path: str, output_mp4: str) -> bool:
                 "-t",
                 "3",
                 output_mp4,
-            ]
-            result = subprocess.run(cmd, capture_output=True, check=False)
-            if result.returncode != 0:
-                logging.error("FFmpeg error: %s", result.stderr.decode(errors="ignore"))
-                return False
-
-            return os.path.exists(output_mp4) and os.path.getsize(output_mp4) > 1000
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            ],
+            timeout=timeout_seconds,
+            input=_stream_chunks(
+                tgs_path=tgs_path, frame_count=frame_count, fps=fps, size=size, run_chunk=run_chunk
+            ),
+            label="ffmpeg tgs",
+        )
+        if not result.ok:
+            return False
 
+        return os.path.exists(output_mp4) and os.path.getsize(output_mp4) > 1000
     except Exception as e:
         logging.error("TGS mp4 error: %s", e, exc_info=True)
         return False
-
@@ -1,63 +1,100 @@
 from __future__ import annotations
 
+from collections.abc import Awaitable, Callable
 from pathlib import Path
 import logging
 import os
-import subprocess
 
-from aiogram.types import FSInputFile, Message
+from aiogram.types import Message
 
-
-def check_server_load(*, max_concurrent_processes: int) -> tuple[bool, int]:
-    """Count running ffmpeg processes and decide whether we can process more."""
-    try:
-        result = subprocess.run(
-            ["pgrep", "-c", "ffmpeg"], capture_output=True, text=True, check=False
-        )
-        count = int(result.stdout.strip()) if result.returncode == 0 else 0
-        can_process = count < max_concurrent_processes
-
-        logging.info(
-            "Load check: %s processes, limit %s, can_process=%s",
-            count,
-            max_concurrent_processes,
-            can_process,
-        )
-        return can_process, count
-    except Exception as e:
-        logging.warning("Failed to check load: %s", e, exc_info=True)
-        return True, 0
+from services.asset_registry import AssetRegistry
+from services.media_scheduler import PRIORITY_IMAGE, MediaScheduler, QueueFullError
 
 
 async def send_overload_message(
     message: Message,
     *,
-    process_count: int,
-    max_concurrent_processes: int,
+    error: QueueFullError,
+    assets: AssetRegistry,
     light_image: Path,
     heavy_image: Path,
 ) -> None:
-    """Send an overload message with an optional image."""
+    """Send an overload message with an optional image (uploaded once, then resent by file_id)."""
     try:
-        if process_count <= max_concurrent_processes + 1:
+        if error.per_user:
             image_path = light_image
-            caption = (
-                f"⚠️ Сервер загружен ({process_count} процессов)\n"
-                f"Попробуй через секунду"
-            )
+            caption = "⚠️ Твои прошлые запросы ещё в работе\nПопробуй чуть позже"
         else:
             image_path = heavy_image
             caption = (
-                f"⚠️ Сервер перегружен ({process_count} процессов)\n"
+                f"⚠️ Сервер перегружен (в очереди {error.queued})\n"
                 f"Подожди немного"
             )
 
         if image_path.exists():
-            await message.answer_photo(FSInputFile(str(image_path)), caption=caption)
+            await assets.answer_photo(message, image_path, caption=caption)
         else:
             logging.error("Overload image not found: %s (cwd=%s)", image_path, os.getcwd())
-            await message.answer(f"⚠️ Сервер перегружен ({process_count} процессов)")
+            await message.answer(caption)
     except Exception as e:
         logging.error("Failed to send overload message: %s", e, exc_info=True)
         await message.answer("⚠️ Слишком много запросов")
 
+
+class _QueueStatus:
+    """Shows the user's place in the queue in a single, edited message."""
+
+    def __init__(self, message: Message) -> None:
+        self._message = message
+        self._status: Message | None = None
+        self._closed = False
+
+    async def update(self, position: int) -> None:
+        if self._closed:
+            return
+        text = f"⏳ В очереди: {position}"
+        if self._status is None:
+            self._status = await self._message.reply(text)
+            if self._closed:
+                # The job started while the reply was in flight.
+                await self._delete()
+        else:
+            await self._status.edit_text(text)
+
+    async def close(self) -> None:
+        self._closed = True
+        await self._delete()
+
+    async def _delete(self) -> None:
+        status, self._status = self._status, None
+        if status is not None:
+            try:
+                await status.delete()
+            except Exception:
+                pass
+
+
+async def run_media_job(
+    message: Message,
+    *,
+    scheduler: MediaScheduler,
+    job: Callable[[], Awaitable[None]],
+    priority: int = PRIORITY_IMAGE,
+    assets: AssetRegistry,
+    light_image: Path,
+    heavy_image: Path,
+) -> None:
+    """Run a heavy handler body inside a scheduler slot; reply with an overload message if rejected."""
+    user_id = message.from_user.id if message.from_user else message.chat.id
+    status = _QueueStatus(message)
+    try:
+        async with scheduler.slot(user_id=user_id, priority=priority, on_position=status.update):
+            await status.close()
+            await job()
+    except QueueFullError as e:
+        logging.warning("Media queue full, rejecting request: %s", e)
+        await send_overload_message(
+            message, error=e, assets=assets, light_image=light_image, heavy_image=heavy_image
+        )
+    finally:
+        await status.close()
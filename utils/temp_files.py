@@ -1,30 +1,129 @@
+"""Scratch space for media jobs: one private directory per job under a single base dir."""
+
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 import logging
 import os
+from pathlib import Path
+import re
+import shutil
 import time
+import uuid
 
+from utils.asyncio_utils import run_in_thread
 
-def cleanup_old_temp_files(*, prefix: str = "temp_", max_age_seconds: int = 3600) -> None:
-    """Remove temp files in current working directory that are older than max_age_seconds."""
-    try:
-        current_time = time.time()
-        removed = 0
 
-        for filename in os.listdir("."):
-            if not filename.startswith(prefix):
-                continue
-            filepath = os.path.join(".", filename)
+# Names of the directories `ScratchSpace.create` makes; nothing else under the base dir is touched.
+_JOB_DIR_NAME = re.compile(r"[a-z_]+-[0-9a-f]{12}")
+
+
+class ScratchQuotaError(RuntimeError):
+    pass
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
             try:
-                file_age = current_time - os.path.getmtime(filepath)
-                if file_age > max_age_seconds:
-                    os.remove(filepath)
-                    removed += 1
-            except Exception:
-                continue
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ScratchSpace:
+    """Per-job scratch directories under `base_dir` (point it at tmpfs, e.g. /dev/shm).
+
+    Every job gets a unique directory, so files of concurrent requests never
+    collide, and cleanup removes just that directory. A job is refused when the
+    live jobs already use `max_bytes`; directories older than `max_age_seconds`
+    (e.g. abandoned emoji-pack dialogs) are removed by the reaper. Startup and
+    the reaper only delete `<label>-<hex>` job directories, so `base_dir` may be
+    shared with other files.
+    """
+
+    def __init__(self, *, base_dir: Path, max_bytes: int, max_age_seconds: int = 3600) -> None:
+        self._base = base_dir
+        self._max_bytes = max_bytes
+        self._max_age = max_age_seconds
+        self._live: set[Path] = set()
 
+    @property
+    def base_dir(self) -> Path:
+        return self._base
+
+    def _job_dirs(self) -> list[os.DirEntry]:
+        try:
+            entries = list(os.scandir(self._base))
+        except OSError:
+            return []
+        return [
+            entry
+            for entry in entries
+            if _JOB_DIR_NAME.fullmatch(entry.name) and entry.is_dir(follow_symlinks=False)
+        ]
+
+    def prepare(self) -> None:
+        self._base.mkdir(parents=True, exist_ok=True)
+        # Nothing is in flight at startup: job directories left here belong to a previous run.
+        for entry in self._job_dirs():
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def usage(self) -> int:
+        """Bytes used by live job directories."""
+        return sum(_dir_size(path) for path in list(self._live))
+
+    async def create(self, label: str) -> Path:
+        """Create a job directory the caller releases later (see `release`)."""
+        if not re.fullmatch(r"[a-z_]+", label):
+            raise ValueError(f"invalid scratch label: {label!r}")
+        used = await run_in_thread(self.usage)
+        if used >= self._max_bytes:
+            raise ScratchQuotaError(f"scratch space is full ({used} bytes in {len(self._live)} jobs)")
+        path = self._base / f"{label}-{uuid.uuid4().hex[:12]}"
+        path.mkdir(parents=True)
+        self._live.add(path)
+        return path
+
+    async def release(self, path: Path) -> None:
+        self._live.discard(path)
+        await run_in_thread(shutil.rmtree, path, ignore_errors=True)
+
+    @asynccontextmanager
+    async def job(self, label: str) -> AsyncIterator[Path]:
+        """A scratch directory that is removed when the block exits."""
+        path = await self.create(label)
+        try:
+            yield path
+        finally:
+            await self.release(path)
+
+    def reap(self) -> int:
+        """Remove job directories older than max_age_seconds; return how many were removed."""
+        removed = 0
+        now = time.time()
+        for entry in self._job_dirs():
+            try:
+                if now - entry.stat().st_mtime <= self._max_age:
+                    continue
+            except OSError:
+                continue
+            self._live.discard(Path(entry.path))
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
         if removed:
-            logging.info("Cleaned up %s old temp files", removed)
-    except Exception as e:
-        logging.error("Cleanup error: %s", e, exc_info=True)
+            logging.info("Reaped %s stale scratch directories", removed)
+        return removed
+
 
+async def reap_scratch(scratch: ScratchSpace, *, interval: float = 10 * 60) -> None:
+    while True:
+        try:
+            await run_in_thread(scratch.reap)
+        except Exception:
+            logging.exception("Unexpected scratch reaper failure")
+        await asyncio.sleep(interval)
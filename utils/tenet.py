@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import bisect
+from io import BytesIO
 import logging
 import os
-import subprocess
+from pathlib import Path
 from typing import NamedTuple
+import unicodedata
 
 from PIL import Image
 
+from utils.ffmpeg import MediaInfo, keyframe_times, probe_media, run_ffmpeg
+
 
 class Antipode(NamedTuple):
     lat: float
@@ -33,101 +39,284 @@ def mirror_image(*, img_path: str, output_path: str) -> bool:
         return False
 
 
-def reverse_video(*, vid_path: str, output_path: str, max_duration: int = 30) -> bool:
-    """Reverse a video or GIF (play backwards)."""
+def mirror_image_bytes(image: bytes) -> bytes | None:
+    """Bytes-in/bytes-out variant of mirror_image (JPEG output)."""
     try:
-        cmd = [
-            "ffmpeg",
-            "-y",
+        mirrored = Image.open(BytesIO(image)).transpose(Image.FLIP_LEFT_RIGHT)
+        if mirrored.mode != "RGB":
+            mirrored = mirrored.convert("RGB")
+        out = BytesIO()
+        mirrored.save(out, "JPEG", quality=95)
+        return out.getvalue()
+    except Exception as e:
+        logging.error("Mirror image error: %s", e, exc_info=True)
+        return None
+
+
+# The `reverse` filter keeps every decoded frame of its input in memory, so
+# inputs that would not fit the budget are reversed in segments.
+_DEFAULT_MEMORY_BUDGET = 384 * 1024 * 1024
+_BYTES_PER_PIXEL = 1.5  # decoded yuv420p
+_MIN_SEGMENT_SECONDS = 0.5
+_SEGMENT_CONCURRENCY = 2
+
+
+def _reverse_args(*, has_audio: bool) -> list[str]:
+    args = ["-vf", "reverse"]
+    if has_audio:
+        args += ["-af", "areverse", "-c:a", "aac", "-b:a", "128k"]
+    else:
+        args += ["-an"]
+    # Segments are concatenated with stream copy, so every encode uses the same settings.
+    return args + ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "23", "-pix_fmt", "yuv420p"]
+
+
+def frames_bytes_per_second(info: MediaInfo) -> float:
+    """Memory the `reverse` filter needs per second of this input."""
+    return info.width * info.height * _BYTES_PER_PIXEL * (info.fps or 30.0)
+
+
+def plan_segments(*, keyframes: list[float], duration: float, max_seconds: float) -> list[tuple[float, float]]:
+    """Split [0, duration) into (start, length) ranges no longer than `max_seconds`.
+
+    Cuts are placed on the last keyframe that fits, so each segment starts
+    decoding right where it begins; with no keyframe in reach (long GOPs) the
+    cut falls at `max_seconds` and ffmpeg decodes from the previous keyframe.
+    """
+    max_seconds = max(max_seconds, _MIN_SEGMENT_SECONDS)
+    segments: list[tuple[float, float]] = []
+    start = 0.0
+    while duration - start > 1e-3:
+        limit = start + max_seconds
+        if limit >= duration:
+            end = duration
+        else:
+            i = bisect.bisect_right(keyframes, limit)
+            aligned = keyframes[i - 1] if i > 0 else 0.0
+            end = aligned if aligned - start >= _MIN_SEGMENT_SECONDS else limit
+        segments.append((start, end - start))
+        start = end
+    return segments
+
+
+async def _reverse_range(
+    *, vid_path: str, output_path: str, start: float, length: float, has_audio: bool, timeout: float, label: str
+) -> bool:
+    result = await run_ffmpeg(
+        [
+            # Both are input options, so only [start, start + length) is decoded and reaches
+            # the reverse filters; as an output option -t would trim after reversing.
+            *(["-ss", f"{start:.3f}"] if start > 0 else []),
+            "-t",
+            f"{length:.3f}",
             "-i",
             vid_path,
-            "-t",
-            str(max_duration),
-            "-vf",
-            "reverse",
-            "-af",
-            "areverse",
-            "-c:v",
-            "libx264",
-            "-preset",
-            "ultrafast",
-            "-crf",
-            "23",
-            "-c:a",
-            "aac",
-            "-b:a",
-            "128k",
+            *_reverse_args(has_audio=has_audio),
             "-movflags",
             "+faststart",
-            "-pix_fmt",
-            "yuv420p",
             output_path,
-        ]
-        logging.info("Reversing video: %s", vid_path)
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300, check=False)
+        ],
+        timeout=timeout,
+        label=label,
+    )
+    return result.ok and os.path.exists(output_path) and os.path.getsize(output_path) > 0
 
-        if result.returncode != 0:
-            # Retry without audio (some inputs have no audio stream).
-            cmd_no_audio = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                vid_path,
-                "-t",
-                str(max_duration),
-                "-vf",
-                "reverse",
-                "-c:v",
-                "libx264",
-                "-preset",
-                "ultrafast",
-                "-crf",
-                "23",
-                "-an",
-                "-movflags",
-                "+faststart",
-                "-pix_fmt",
-                "yuv420p",
-                output_path,
-            ]
-            result = subprocess.run(
-                cmd_no_audio, capture_output=True, text=True, timeout=300, check=False
+
+async def _reverse_segmented(
+    *,
+    vid_path: str,
+    output_path: str,
+    segments: list[tuple[float, float]],
+    has_audio: bool,
+    concurrency: int,
+    timeout: float,
+) -> bool:
+    """Reverse each segment on its own and concatenate them last-to-first."""
+    count = len(segments)
+    base = Path(output_path)
+    parts = [str(base.with_name(f"{base.stem}-part{i}.mp4")) for i in range(count)]
+    listing = base.with_name(f"{base.stem}-parts.txt")
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def reverse_part(i: int) -> bool:
+        start, length = segments[i]
+        async with semaphore:
+            return await _reverse_range(
+                vid_path=vid_path,
+                output_path=parts[i],
+                start=start,
+                length=length,
+                has_audio=has_audio,
+                timeout=timeout,
+                label=f"ffmpeg reverse part {i + 1}/{count}",
             )
-            if result.returncode != 0:
-                logging.error("FFmpeg reverse error: %s", result.stderr)
-                return False
 
-        return os.path.exists(output_path) and os.path.getsize(output_path) > 0
-    except subprocess.TimeoutExpired:
-        logging.error("Video reverse timeout")
-        return False
+    try:
+        if not all(await asyncio.gather(*(reverse_part(i) for i in range(count)))):
+            return False
+        listing.write_text("".join(f"file '{os.path.basename(p)}'\n" for p in reversed(parts)))
+        result = await run_ffmpeg(
+            ["-f", "concat", "-safe", "0", "-i", str(listing), "-c", "copy", "-movflags", "+faststart", output_path],
+            timeout=timeout,
+            label="ffmpeg reverse concat",
+        )
+        return result.ok and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+    finally:
+        for path in (*parts, str(listing)):
+            Path(path).unlink(missing_ok=True)
+
+
+async def reverse_video(
+    *,
+    vid_path: str,
+    output_path: str,
+    max_duration: int = 30,
+    timeout_seconds: float = 300,
+    memory_budget: int = _DEFAULT_MEMORY_BUDGET,
+    concurrency: int = _SEGMENT_CONCURRENCY,
+) -> bool:
+    """Reverse a video or GIF (play backwards).
+
+    The input is probed first, so silent clips are encoded once without an audio
+    chain. Inputs whose frames would not fit `memory_budget` are cut into
+    keyframe-aligned segments small enough that `concurrency` of them do.
+    """
+    try:
+        logging.info("Reversing video: %s", vid_path)
+        info = await probe_media(vid_path)
+        if info is None:
+            return False
+
+        duration = min(info.duration, max_duration) if info.duration > 0 else 0.0
+        per_second = frames_bytes_per_second(info)
+        if duration > 0 and duration * per_second > memory_budget:
+            max_seconds = memory_budget / max(1, concurrency) / per_second
+            keyframes = await keyframe_times(vid_path, until=duration)
+            segments = plan_segments(keyframes=keyframes, duration=duration, max_seconds=max_seconds)
+            if len(segments) > 1:
+                return await _reverse_segmented(
+                    vid_path=vid_path,
+                    output_path=output_path,
+                    segments=segments,
+                    has_audio=info.has_audio,
+                    concurrency=concurrency,
+                    timeout=timeout_seconds,
+                )
+
+        return await _reverse_range(
+            vid_path=vid_path,
+            output_path=output_path,
+            start=0,
+            length=duration or max_duration,
+            has_audio=info.has_audio,
+            timeout=timeout_seconds,
+            label="ffmpeg reverse",
+        )
     except Exception as e:
         logging.error("Reverse video error: %s", e, exc_info=True)
         return False
 
 
+_ZWJ = "\u200d"
+# Document size caps for /tenet: the text one keeps the reply reasonable, the
+# PDF one bounds the objects PyPDF2 has to hold.
+TEXT_REVERSE_MAX_BYTES = 5 * 1024 * 1024
+PDF_REVERSE_MAX_PAGES = 500
+_TEXT_CHUNK_BYTES = 64 * 1024
+
+
+def _is_regional_indicator(ch: str) -> bool:
+    return 0x1F1E6 <= ord(ch) <= 0x1F1FF
+
+
+def _extends(cluster: str, ch: str) -> bool:
+    """Whether `ch` belongs to the grapheme cluster that ends with `cluster`."""
+    cp = ord(ch)
+    if unicodedata.category(ch) in ("Mn", "Me", "Mc") or ch == _ZWJ:
+        return True
+    # Variation selectors, skin tone modifiers, tag characters of subdivision flags.
+    if 0xFE00 <= cp <= 0xFE0F or 0x1F3FB <= cp <= 0x1F3FF or 0xE0020 <= cp <= 0xE007F:
+        return True
+    if cluster.endswith(_ZWJ):
+        return True
+    if cluster == "\r" and ch == "\n":
+        return True
+    # Flags are pairs of regional indicators.
+    return len(cluster) == 1 and _is_regional_indicator(cluster) and _is_regional_indicator(ch)
+
+
+def graphemes(text: str) -> list[str]:
+    """Split text into user-perceived characters (combining marks, emoji ZWJ sequences, flags).
+
+    A pragmatic subset of UAX #29 that keeps emoji and accents intact when reversed.
+    """
+    clusters: list[str] = []
+    for ch in text:
+        if clusters and _extends(clusters[-1], ch):
+            clusters[-1] += ch
+        else:
+            clusters.append(ch)
+    return clusters
+
+
 def reverse_text(text: str) -> str:
-    return text[::-1]
+    return "".join(reversed(graphemes(text)))
+
 
+def reverse_text_file(*, input_path: str, output_path: str, chunk_size: int = _TEXT_CHUNK_BYTES) -> bool:
+    """Reverse a UTF-8 text file reading it backwards in chunks; memory stays at one chunk.
 
-def reverse_audio(*, audio_path: str, output_path: str) -> bool:
+    The first cluster of every chunk is carried over to the next (earlier) chunk,
+    so characters and clusters split by a chunk boundary are reassembled.
+    """
     try:
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-i",
-            audio_path,
-            "-af",
-            "areverse",
-            "-c:a",
-            "libopus",
-            "-b:a",
-            "64k",
-            output_path,
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120, check=False)
-        if result.returncode != 0:
-            logging.error("Audio reverse error: %s", result.stderr)
+        with open(input_path, "rb") as src, open(output_path, "w", encoding="utf-8") as dst:
+            pos = src.seek(0, os.SEEK_END)
+            carry = b""
+            while pos > 0:
+                step = min(chunk_size, pos)
+                pos -= step
+                src.seek(pos)
+                buf = src.read(step) + carry
+                if pos == 0:
+                    dst.write(reverse_text(buf.decode("utf-8", errors="ignore")))
+                    break
+                # Leading continuation bytes belong to a character that starts in the earlier chunk.
+                cut = 0
+                while cut < len(buf) and buf[cut] & 0xC0 == 0x80:
+                    cut += 1
+                clusters = graphemes(buf[cut:].decode("utf-8", errors="ignore"))
+                # Flag pairing depends on where a run of regional indicators starts, so a
+                # leading run is carried over whole.
+                keep = 1
+                while keep < len(clusters) and _is_regional_indicator(clusters[keep - 1][0]):
+                    keep += 1
+                carry = buf[:cut] + "".join(clusters[:keep]).encode("utf-8")
+                dst.write("".join(reversed(clusters[keep:])))
+        return True
+    except Exception as e:
+        logging.error("Reverse text file error: %s", e, exc_info=True)
+        return False
+
+
+async def reverse_audio(*, audio_path: str, output_path: str, timeout_seconds: float = 120) -> bool:
+    try:
+        result = await run_ffmpeg(
+            [
+                "-i",
+                audio_path,
+                "-af",
+                "areverse",
+                "-c:a",
+                "libopus",
+                "-b:a",
+                "64k",
+                output_path,
+            ],
+            timeout=timeout_seconds,
+            label="ffmpeg reverse audio",
+        )
+        if not result.ok:
             return False
         return os.path.exists(output_path) and os.path.getsize(output_path) > 0
     except Exception as e:
@@ -135,7 +324,12 @@ def reverse_audio(*, audio_path: str, output_path: str) -> bool:
         return False
 
 
-def reverse_pdf(*, pdf_path: str, output_path: str) -> bool:
+def reverse_pdf(*, pdf_path: str, output_path: str, max_pages: int = PDF_REVERSE_MAX_PAGES) -> bool:
+    """Write the pages of a PDF in reverse order.
+
+    PyPDF2 has no incremental writer: every page is held in memory until
+    `write()`, so memory is bounded by refusing documents over `max_pages`.
+    """
     try:
         from PyPDF2 import PdfReader, PdfWriter
     except ImportError:
@@ -144,14 +338,17 @@ def reverse_pdf(*, pdf_path: str, output_path: str) -> bool:
 
     try:
         reader = PdfReader(pdf_path)
+        count = len(reader.pages)
+        if count > max_pages:
+            logging.warning("PDF has too many pages to reverse: %s > %s", count, max_pages)
+            return False
         writer = PdfWriter()
-        for page in reversed(reader.pages):
-            writer.add_page(page)
+        for i in range(count - 1, -1, -1):
+            writer.add_page(reader.pages[i])
         with open(output_path, "wb") as f:
             writer.write(f)
-        logging.info("Reversed PDF: %s pages", len(reader.pages))
+        logging.info("Reversed PDF: %s pages", count)
         return True
     except Exception as e:
         logging.error("PDF reverse error: %s", e, exc_info=True)
         return False
-
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
+from io import BytesIO
 import logging
 
 from PIL import Image, ImageFont
 from pilmoji import Pilmoji
 
+from utils.emoji_cache import emoji_source
 from utils.fonts import get_font, get_unicode_font
 
 
@@ -37,7 +39,7 @@ def fit_text(text: str, *, font: ImageFont.ImageFont, max_width: int, img: Image
     words = text.split()
     current_line = ""
 
-    with Pilmoji(img) as pilmoji:
+    with Pilmoji(img, source=emoji_source()) as pilmoji:
         for word in words:
             if len(lines) >= 10:
                 break
@@ -59,6 +61,58 @@ def fit_text(text: str, *, font: ImageFont.ImageFont, max_width: int, img: Image
     return lines if lines else ["..."]
 
 
+def render_text_image(
+    text: str,
+    *,
+    size: tuple[int, int] = (600, 600),
+    font_paths: Sequence[str],
+    unicode_font_paths: Sequence[str],
+) -> Image.Image:
+    """Render text centered on a white canvas (with colored emojis via Pilmoji)."""
+    img = Image.new("RGB", size, "white")
+    use_unicode = has_emoji(text)
+
+    max_font_size = 120
+    min_font_size = 40
+
+    best_font: ImageFont.ImageFont | None = None
+    best_lines: list[str] = []
+
+    for font_size in range(max_font_size, min_font_size, -10):
+        font = (
+            get_unicode_font(font_size, unicode_font_paths=unicode_font_paths, font_paths=font_paths)
+            if use_unicode
+            else get_font(font_size, font_paths=font_paths)
+        )
+        lines = fit_text(text, font=font, max_width=size[0] - 40, img=img)
+        total_height = len(lines) * (font_size + 10)
+        if total_height < size[1] - 40:
+            best_font = font
+            best_lines = lines
+            break
+
+    if best_font is None:
+        best_font = (
+            get_unicode_font(min_font_size, unicode_font_paths=unicode_font_paths, font_paths=font_paths)
+            if use_unicode
+            else get_font(min_font_size, font_paths=font_paths)
+        )
+        best_lines = fit_text(text, font=best_font, max_width=size[0] - 40, img=img)
+
+    font_size = getattr(best_font, "size", min_font_size)
+    total_height = len(best_lines) * (font_size + 10)
+    y = (size[1] - total_height) / 2
+
+    with Pilmoji(img, source=emoji_source()) as pilmoji:
+        for line in best_lines:
+            line_w, _ = pilmoji.getsize(line, font=best_font)
+            x = (size[0] - line_w) / 2
+            pilmoji.text((int(x), int(y)), line, font=best_font, fill="black")
+            y += font_size + 10
+
+    return img
+
+
 def generate_text_image(
     text: str,
     *,
@@ -69,50 +123,31 @@ def generate_text_image(
 ) -> bool:
     """Generate an image from text (with colored emojis via Pilmoji)."""
     try:
-        img = Image.new("RGB", size, "white")
-        use_unicode = has_emoji(text)
-
-        max_font_size = 120
-        min_font_size = 40
-
-        best_font: ImageFont.ImageFont | None = None
-        best_lines: list[str] = []
-
-        for font_size in range(max_font_size, min_font_size, -10):
-            font = (
-                get_unicode_font(font_size, unicode_font_paths=unicode_font_paths, font_paths=font_paths)
-                if use_unicode
-                else get_font(font_size, font_paths=font_paths)
-            )
-            lines = fit_text(text, font=font, max_width=size[0] - 40, img=img)
-            total_height = len(lines) * (font_size + 10)
-            if total_height < size[1] - 40:
-                best_font = font
-                best_lines = lines
-                break
-
-        if best_font is None:
-            best_font = (
-                get_unicode_font(min_font_size, unicode_font_paths=unicode_font_paths, font_paths=font_paths)
-                if use_unicode
-                else get_font(min_font_size, font_paths=font_paths)
-            )
-            best_lines = fit_text(text, font=best_font, max_width=size[0] - 40, img=img)
-
-        font_size = getattr(best_font, "size", min_font_size)
-        total_height = len(best_lines) * (font_size + 10)
-        y = (size[1] - total_height) / 2
-
-        with Pilmoji(img) as pilmoji:
-            for line in best_lines:
-                line_w, _ = pilmoji.getsize(line, font=best_font)
-                x = (size[0] - line_w) / 2
-                pilmoji.text((int(x), int(y)), line, font=best_font, fill="black")
-                y += font_size + 10
-
+        img = render_text_image(
+            text, size=size, font_paths=font_paths, unicode_font_paths=unicode_font_paths
+        )
         img.save(output_path, quality=95)
         return True
     except Exception as e:
         logging.error("Error generating text image: %s", e, exc_info=True)
         return False
 
+
+def generate_text_image_bytes(
+    text: str,
+    *,
+    size: tuple[int, int] = (600, 600),
+    font_paths: Sequence[str],
+    unicode_font_paths: Sequence[str],
+) -> bytes | None:
+    """Bytes-out variant of generate_text_image (JPEG output)."""
+    try:
+        img = render_text_image(
+            text, size=size, font_paths=font_paths, unicode_font_paths=unicode_font_paths
+        )
+        out = BytesIO()
+        img.save(out, "JPEG", quality=95)
+        return out.getvalue()
+    except Exception as e:
+        logging.error("Error generating text image: %s", e, exc_info=True)
+        return None